@@ -0,0 +1,36 @@
+#***********************************************************************************************************
+# *HGSpy
+# *By Caleb Fuster, Manel Soria and Arnau Miró
+# *ESEIAAT UPC
+#***********************************************************************************************************
+#
+# Equilibrium with liquid and solid products. A condensed species is only
+# present within the temperature range of its polynomials, out of it (and
+# without mols) it is excluded from the mixture.
+from __future__ import print_function
+
+import numpy as np, HGSpy as HGS
+
+
+HGS.set_options('warnings',False) # Deactivate warnings
+
+# Water vapour condensing as a N2/H2O mixture is cooled at 1 bar,
+# H2O(l) has polynomials from 273.15 K to 600 K
+species = ['N2','H2O','H2O(l)']
+n0      = [1,1,0]
+print('Condensation of H2O on a N2/H2O mixture at 1 bar')
+for T in [800,500,350,300]:
+	_,n,_ = HGS.eq(species,n0,T,1)
+	print('T = %6.1f K  H2O(g) = %.4f mol  H2O(l) = %.4f mol'%(T,n[1],n[2]))
+
+# Adiabatic combustion of aluminium with oxygen, the alumina is
+# a liquid at the flame temperature
+species = ['Al','O2','AlO','O','Al2O3(l)']
+n0      = [2,1.5,0,0,0]
+_,n,_,state = HGS.eq(species,n0,300,10,constraint='HP',Tstar=3000)
+Teq = state['T']
+print('\nAl/O2 adiabatic flame temperature at 10 bar: %.1f K'%Teq)
+for s,ni in zip(species,n):
+	print('%-10s %.4f mol'%(s,ni))
+
+HGS.cr_info()
@@ -0,0 +1,34 @@
+#***********************************************************************************************************
+# *HGSpy
+# *By Caleb Fuster, Manel Soria and Arnau Miró
+# *ESEIAAT UPC
+#***********************************************************************************************************
+#
+# Adiabatic flame temperature computed in two ways: the HP constrained
+# equilibrium (a single Newton solve in T and n) and HGS.Tp (an outer
+# iteration in T over TP equilibria). Both must give the same products,
+# Tp up to the tolerance of its secant solver (tightened here).
+from __future__ import print_function
+
+import numpy as np, HGSpy as HGS
+
+
+HGS.set_options('warnings',False) # Deactivate warnings
+
+species = ['H2','O2','H2O','H','O','OH']
+P       = 10 # bar
+opt_sec = {"xmin": 300, "xmax": 4000, "maxiter": 200, "epsx": 1e-3,
+		   "epsy": 1e-3, "fchange": 500, "info": 0, "dTp": 100}
+
+print('%6s %12s %12s %10s %10s'%('O/F','T HP [K]','T Tp [K]','dT [K]','max dn'))
+for nO2 in [0.3,0.5,0.8,1.2]:
+	n0 = [1,nO2,0,0,0,0]
+	_,n_hp,_,state = HGS.eq(species,n0,350,P,constraint='HP')
+	T_tp,n_tp,_,_  = HGS.Tp(species,n0,'T',350,P,opt_sec=opt_sec)
+	dT = abs(state['T'] - T_tp)
+	dn = np.max(np.abs(np.asarray(n_hp) - np.asarray(n_tp)))
+	print('%6.2f %12.3f %12.3f %10.2e %10.2e'%(nO2*31.998/2.016,state['T'],T_tp,dT,dn))
+	if dT > 0.05 or dn > 1e-4:
+		raise ValueError('HP equilibrium and Tp do not agree')
+
+HGS.cr_info()
@@ -8,6 +8,8 @@ ESEIAAT UPC
 '''
 import os
 
+__version__ = '1.1'
+
 # Paths to important files
 DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'data')
 HGSDATA  = os.path.join(DATAPATH,'data.hgs')
@@ -21,15 +23,23 @@ from .utils       import set_options, get_options
 
 # HGS functions
 from .hgs_id         import hgs_id
-from .hgs_find       import hgs_find
+from .hgs_find       import hgs_find, hgs_candidates
 from .hgs_mixture    import hgs_add_mixture, hgs_subt_mixture, hgs_rebuild
 from .hgs_print      import hgs_print_info
 from .hgs_prop       import hgs_prop as prop, hgs_single as single
 from .hgs_eq         import hgs_eq as eq
-from .hgs_Tp         import hgs_Tp as Tp
+from .hgs_Tp         import hgs_Tp as Tp, hgs_Tp_iter as Tp_iter
 from .hgs_isentropic import hgs_isentropic as isentropic
-from .hgs_nozzle     import hgs_nozzle as nozzle
+from .hgs_nozzle     import hgs_nozzle as nozzle, hgs_nozzle_eps as nozzle_eps, hgs_nozzle_adaptive as nozzle_adaptive, hgs_nozzle_iter as nozzle_iter
 from .hgs_solver     import options
+from .hgs_system     import System
+from .hgs_table      import hgs_table as table, EqTable
+from .hgs_temperature import hgs_T_from_h, hgs_T_from_s
+from .hgs_cache      import eq_cache_info, eq_cache_clear, disk_cache_clear
+from .hgs_gradient   import hgs_Tp_grad as Tp_grad, hgs_rocket as rocket
+from .hgs_optimize   import hgs_optimize_of as optimize_of
+from .hgs_trade      import hgs_trade as trade, TradeStudy
+from .hgs_result     import HGSResult
 
 # Some predefined functions
 id           = lambda species,hgs_data=HGSData.load(),raise_error=True : hgs_id(species,hgs_data,raise_error)
@@ -37,8 +47,11 @@ add_mixture  = lambda name,species,percent,hgs_data=HGSData.load()     : hgs_add
 subt_mixture = lambda name,hgs_data=HGSData.load()                     : hgs_subt_mixture(name,hgs_data)
 rebuild      = lambda species,n,T,hgs_data=HGSData.load()              : hgs_rebuild(species,n,T,hgs_data)
 print_info   = lambda name,hgs_data=HGSData.load()                     : hgs_print_info(name,hgs_data)
-find         = lambda name,complete=False,hgs_data=HGSData.load()      : hgs_find(name,complete,hgs_data)
+find         = lambda name,complete=False,mode='substring',verbose=True,hgs_data=HGSData.load() : hgs_find(name,complete,hgs_data,mode,verbose)
+T_from_h     = lambda ids,n,h,P,options=hgs_temperature.options,hgs_data=HGSData.load() : hgs_T_from_h(ids,n,h,P,options,hgs_data)
+T_from_s     = lambda ids,n,s,P,options=hgs_temperature.options,hgs_data=HGSData.load() : hgs_T_from_s(ids,n,s,P,options,hgs_data)
+candidates   = lambda elements,states=('G',),T_range=None,hgs_data=HGSData.load() : hgs_candidates(elements,states,T_range,hgs_data)
 
 del os, hgs, definitions, cr, utils
 del hgs_id, hgs_prop, hgs_solver, hgs_mixture, hgs_print
-del hgs_eq, hgs_Tp, hgs_isentropic, hgs_nozzle
\ No newline at end of file
+del hgs_eq, hgs_Tp, hgs_isentropic, hgs_nozzle, hgs_system, hgs_merge, hgs_cache, hgs_table, hgs_temperature, hgs_gradient, hgs_optimize, hgs_trade, hgs_result
\ No newline at end of file
@@ -9,6 +9,6 @@ ESEIAAT UPC
 ***********************************************************************************************************
 '''
 
-from .downloader import download
+from .downloader import download, parse_therm
 
 del downloader
\ No newline at end of file
@@ -10,9 +10,9 @@ ESEIAAT UPC
 '''
 from __future__ import print_function, division
 
-import os, urllib.request, numpy as np
+import os, re, urllib.request, numpy as np
 
-from ..            import RAWDATA
+from ..            import RAWDATA, HGSDATA
 from ..hgs         import HGSData
 from ..cr          import cr
 from ..utils       import raiseError
@@ -22,74 +22,129 @@ from ..definitions import Mendeley
 URLDATA = 'http://garfield.chem.elte.hu/Burcat/THERM.DAT'
 
 
-def fix_str_float(s):
-	return s.replace('D','E').replace('E ','E+').replace(' ','')
+# Name fixes applied, in order, on a single pass
+NAME_FIXES = {
+	'(L)'         : '(l)',
+	'(liq)'       : '(l)',
+	'(S)'         : '(s)',
+	' cr'         : '(cr)',
+	'(cr)A'       : '(cr.A)',
+	'(cr)B'       : '(cr.B)',
+	'(cr)C'       : '(cr.C)',
+	'(cr)I'       : '(cr.I)',
+	'(cr)II'      : '(cr.II)',
+	'(III)cr'     : '(cr.III)',
+	'(G)'         : '(g)',
+	'(gas)'       : '(g)',
+	' gas'        : '(g)',
+	' g '         : '(g)',
+	'REF'         : '',
+	'REF-ELEMENT' : '',
+}
+NAME_REGEX = re.compile('|'.join(re.escape(k) for k in NAME_FIXES.keys()))
+
+
+def fix_name(name,ena):
+	'''
+	Normalize the name of a species
+	'''
+	# Fix that some names do not contain the element
+	# by its lower case value
+	for s in ena:
+		name = name.replace(s.upper(),s)
+	return NAME_REGEX.sub(lambda m: NAME_FIXES[m.group(0)],name)
 
 
-def parse_chemkin_elem(e):
+def parse_floats(fields):
 	'''
-	Parse a single element of the database
+	Convert a block of fixed width fields (bytes) to floats
+	'''
+	fields = np.char.replace(fields,b' ',b'')
+	fields = np.where((fields == b'') | (np.char.find(fields,b'N/A') >= 0),b'nan',fields)
+	return fields.astype(np.double)
+
+
+@cr('HGS.parse_therm')
+def parse_therm(fname,info=False):
+	'''
+	Parse a CHEMKIN/NASA-7 THERM file and return a dictionary with the
+	fields of the HGS database (name, state, lim, ena, nat, lv, hv, mm).
+
+	The file is read once; the records are found by the line numbers
+	(1 to 4) on column 80 and all the fixed width columns are decoded
+	in bulk.
 	'''
-	out = {}
+	f = open(fname,'rb')
+	lines = f.read().replace(b'\r\n',b'\n').split(b'\n')
+	f.close()
+
+	# Default temperature ranges, on the line after THERMO
+	tdef = [300.,1000.,5000.]
+	for ii,l in enumerate(lines):
+		if l.strip().upper().startswith(b'THERMO'):
+			try:    tdef = [float(t) for t in lines[ii+1].split()[:3]]
+			except: pass
+			break
+
+	# Find the records, four lines numbered 1 to 4
+	if info: print('Finding records...',end=' ')
+	mark  = np.array([l[79:80] if len(l) > 79 else b' ' for l in lines]+[b' ']*3)
+	irec  = np.where((mark[:-3] == b'1') & (mark[1:-2] == b'2') & (mark[2:-1] == b'3') & (mark[3:] == b'4'))[0]
+	if info: print('%d found!'%len(irec))
+
 	# Parse name up to the first whitespace
-	i1 = e.find(' ')
-	n = e[:i1].strip()
-	if n.lower() == 'air':   return None # Skip air as no composition is given
-	if 'mgcl2' in n.lower(): return None # Skip as it is horrible to parse
-	out['name'] = n
-	e = e[18+6:]
-
-	# Then parse composition, with a maximum
-	# of 4 elements
-	ename, enum = [], []
+	names = [lines[i].split()[0].decode() if len(lines[i].split()) > 0 else '' for i in irec]
+	# Skip air as no composition is given and MgCl2 as
+	# it is horrible to parse
+	keep  = [not (n.lower() == 'air' or 'mgcl2' in n.lower()) for n in names]
+	names = [n for n,k in zip(names,keep) if k]
+	irec  = irec[keep]
+	nrec  = len(irec)
+
+	# Fixed width blocks
+	if info: print('Parsing database...',end=' ')
+	head  = np.frombuffer(b''.join(lines[i][:80].ljust(80) for i in irec),'S1').reshape(nrec,80)
+	body  = b''.join(lines[i+j][:75].ljust(75) for i in irec for j in range(1,4))
+	body  = body.replace(b'D',b'E').replace(b'E ',b'E+')
+	coefs = parse_floats(np.frombuffer(body,'S15').reshape(nrec,15))
+	block = lambda i0,i1: np.ascontiguousarray(head[:,i0:i1]).view('S%d'%(i1-i0)).ravel()
+
+	# Composition, with a maximum of 4 elements
+	enames, enums = [], []
 	for jj in range(4):
-		# for that find the jth point
-		# and parse the number
-		ee = e[:5]
-		if len(ee.strip()) == 0: e = e[5:]; continue
-		n  = int(float(ee[2:].strip()))
-		# If the number is 0 we do not
-		# have more elements
-		if n == 0: e = e[5:]; continue
-		# Now we do have an element
-		enum.append(n)
-		# An element name has a maximum of two letters
-		n = ee[:2].strip()
-		# If len(n) == 2 make the second letter lower case
-		if len(n) == 2: n = n[0] + n[1].lower()
-		ename.append(n)
-		e = e[5:]
-	out['ena'] = ename
-	out['nat'] = enum
-
-	# Parse state
-	out['state'] = e[:4].strip()
-	e = e[4:]
-
-	# Parse limits
-	out['lim'] = [float(s.strip().replace(',','.')) for s in e[:25].split()]
-	l = out['lim'][1]
-	out['lim'][1] = out['lim'][2]
-	out['lim'][2] = l
-	e = e[e.find('\n')+1:]
-
-	# Parse coefficients
-	coefs = []
-	for ii in range(3): # Read 3 rows of coefficients
-		l = e[:e.find('\n')]
-		for jj in range(5): # with 5 coefficients each
-			coefs.append( float(fix_str_float(l[:15])) if not 'N/A' in l[:15] else np.nan )
-			l  = l[15:]
-		e = e[e.find('\n')+1:]
-	coefs = np.array(coefs)
-	out['hv'] = coefs[:7]
-	out['lv'] = coefs[7:14]
+		i0  = 24 + 5*jj
+		num = np.char.strip(block(i0+2,i0+5))
+		enames.append(np.char.strip(block(i0,i0+2)))
+		enums.append(parse_floats(np.where(num == b'',b'0',num)).astype(int))
+	states = np.char.strip(block(44,48))
+	lims   = block(48,73)
+
+	# Assemble the database entries
+	out = {'name':[],'state':[],'lim':[],'ena':[],'nat':[],'lv':[],'hv':[],'mm':[]}
+	for ii,name in enumerate(names):
+		ena, nat = [], []
+		for jj in range(4):
+			if enums[jj][ii] == 0: continue
+			e = enames[jj][ii].decode()
+			ena.append(e[0] + e[1].lower() if len(e) == 2 else e)
+			nat.append(int(enums[jj][ii]))
+		lim = [float(l.replace(',','.')) for l in lims[ii].decode().split()]
+		if len(lim) == 2: lim.append(tdef[1]) # Use default common temperature
+		out['name'].append(fix_name(name,ena))
+		out['state'].append(states[ii].decode())
+		out['lim'].append([lim[0],lim[2],lim[1]])
+		out['ena'].append(ena)
+		out['nat'].append(nat)
+		out['hv'].append(coefs[ii,:7])
+		out['lv'].append(coefs[ii,7:14])
+		out['mm'].append(float(sum(n*Mendeley[e] for n,e in zip(nat,ena) if e in Mendeley.keys())))
+	if info: print('Done!')
 
 	return out
 
 
 @cr('HGS.download')
-def download(download=True,info=False):
+def download(download=True,info=False,fname=None,mixtures=False):
 	"""
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
@@ -104,10 +159,13 @@ def download(download=True,info=False):
 	-----------------------------------------------------------------------------
 	 **kwargs --> download= To download the database from internet
 				  info= To show the evolution of the database building
+				  fname= Write the database to this file
+				  mixtures= Keep the mixtures of the current database
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Outputs:
 	-----------------------------------------------------------------------------
+	 hgs_data --> New HGS database
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	 * Python HGS 1.0 from Matlab HGS 2.0
@@ -122,100 +180,19 @@ def download(download=True,info=False):
 		print("HGS database downloaded - \n")
 	if not os.path.isfile(RAWDATA): raiseError('Database not expected in the right directory <%s>!'%RAWDATA)
 
-	try:
-		hgs_old = HGSData.load(fname=HGSDATA)
-		hgs_new = HGSData.new(comb=hgs_old['comb'],cspec=hgs_old['cspec'],cper=hgs_old['cper'])
-	except:
-		hgs_new = HGSData.new()
-
 	# ----- Database processing ------ #
-	# Open file read and text mode
-	f = open(RAWDATA, 'r')
-	lines = f.readlines()
-	f.close()
-
-	# Find index of THERMO ALL to start parsing
-	# the database
-	if info: print('Skipping header...')
-	iline = -1
-	for ii,l in enumerate(lines):
-		if 'THERMO ALL' == l.strip():
-			iline = ii
-			break
-
-	# Group the items in 4 by 4 so that
-	# it corresponds to a full entry of the
-	# database
-	if info: print('Grouping table items...')
-	dbase = []
-	for ii in range((len(lines)-iline-1)//4):
-		s, istart = '', iline + 2 + 4*ii
-		s += lines[istart]
-		for jj in range(3):
-			s += lines[istart+jj+1]
-		dbase.append(s)
-
-	# Parse database items one by one
-	if info: print('Parsing database...',end=' ')
-	for d in dbase:
-		out = parse_chemkin_elem(d)
-		if out is not None: hgs_new.append_dict(out)
-	if info: print('Done!')
-	
-	# Perform some name modifications and cleaning up
-	# of the database
-	if info: print('Name modifications...',end=' ')
-	for ii in range(len(hgs_new)):
-		# Fix that some names do not contain the element
-		# by its lower case value
-		for s in hgs_new['ena'][ii]:
-			if s.upper() in hgs_new['name'][ii]: 
-				hgs_new['name'][ii] = hgs_new['name'][ii].replace(s.upper(),s)
-		
-		# - Liquid Change - #
-		for s in ['(L)','(liq)']:
-			if s in hgs_new['name'][ii]:
-				hgs_new['name'][ii] = hgs_new['name'][ii].replace(s,'(l)')
-
-		# - Solid Change - #
-		if '(S)' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(S)','(s)')
-
-		# Solid change  cr -> (cr)
-		if ' cr' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace(' cr','(cr)')
-		if '(cr)A' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(cr)A','(cr.A)')
-		if '(cr)B' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(cr)B','(cr.B)')
-		if '(cr)C' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(cr)C','(cr.C)')
-		if '(cr)I' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(cr)I','(cr.I)')
-		if '(cr)II' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(cr)II','(cr.II)') 
-		if '(III)cr' in hgs_new['name'][ii]:
-			hgs_new['name'][ii] = hgs_new['name'][ii].replace('(III)cr','(cr.III)')       
-
-		# - Gas - #
-		for s in ['(G)','(gas)',' gas',' g ']:
-			if s in hgs_new['name'][ii]:
-				hgs_new['name'][ii] = hgs_new['name'][ii].replace(s,'(g)')
-		
-		# - Ref element - #
-		for s in ['REF','REF-ELEMENT']:
-			if s in hgs_new['name'][ii]:
-				hgs_new['name'][ii] = hgs_new['name'][ii].replace(s,'')
-
-	if info: print('Done!')
-
-	# Molar Mass calculation
-	if info: print('Molar Mass calculation ...', end=' ')
-	for ii in range(len(hgs_new)):
-		mm = 0.
-		for n,e in zip(hgs_new['nat'][ii],hgs_new['ena'][ii]):
-			if e in Mendeley.keys(): mm += n*Mendeley[e]
-		hgs_new["mm"].append(mm)
-	if info: print('Done!')
+	out = parse_therm(RAWDATA,info=info)
+
+	# Keep the mixtures of the current database if requested
+	mixt = {'comb':[],'cspec':[],'cper':[]}
+	if mixtures:
+		try:
+			hgs_old = HGSData.load(fname=HGSDATA)
+			mixt    = {'comb':hgs_old['comb'],'cspec':hgs_old['cspec'],'cper':hgs_old['cper']}
+		except:
+			pass
+
+	hgs_new = HGSData.new(nameback=[],**out,**mixt)
+	if fname is not None: hgs_new.save(fname)
 
 	return hgs_new
\ No newline at end of file
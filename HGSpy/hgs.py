@@ -10,21 +10,71 @@ ESEIAAT UPC
 '''
 from __future__ import print_function, division
 
-import numpy as np, pickle as pkl
+import os, hashlib, numpy as np, pickle as pkl
 
-from .            import HGSDATA
+from .            import __version__, HGSDATA
 from .hgs_id      import hgs_id
 from .hgs_mixture import hgs_add_mixture, hgs_subt_mixture, hgs_rebuild
+from .hgs_merge   import hgs_merge_thermo, hgs_merge_species
 from .hgs_print   import hgs_print_info
+from .hgs_find    import hgs_find, hgs_candidates, build_search
 from .utils       import raiseError
 from .definitions import R
 
 
+def select_coefs(T,lim,lv,hv,name):
+	'''
+	Select, for a block of species each at its own temperature,
+	the low or high NASA polynomials checking the limits. name(ii)
+	is the name of the species ii of the block, for the error.
+	'''
+	out = (T < lim[:,0]) | (T > lim[:,2])
+	if np.any(out):
+		ii = np.where(out)[0][0]
+		raiseError(f"hgs_single: Ups... Temperature {T[ii]} is not between the limits ({lim[ii,0]:.2f}K-{lim[ii,2]:.2f}K) for {name(ii)}")
+	return np.where((T <= lim[:,1])[:,None],lv,hv)
+
+
+def species_digest(data,ii):
+	'''
+	Content hash of a species of the database
+	'''
+	h = hashlib.sha1()
+	h.update(('%s|%s|%s|' % (data['name'][ii],data['state'][ii],','.join(data['ena'][ii]))).encode())
+	for key in ['lim','nat','lv','hv','mm']:
+		h.update(np.asarray(data[key][ii],np.double).tobytes())
+	return h.digest()
+
+
+# Numeric fields stored on shared memory and their
+# number of values per species
+SHARED_KEYS = {'lim':3,'lv':7,'hv':7,'mm':1}
+
+def _shared_arrays(buf,start,ns):
+	'''
+	Views of the numeric fields on a shared memory buffer
+	'''
+	out = {}
+	for key,nv in SHARED_KEYS.items():
+		shape    = (ns,nv) if nv > 1 else (ns,)
+		out[key] = np.ndarray(shape,np.double,buffer=buf,offset=start)
+		start   += 8*ns*nv
+	return out
+
+
 class HGSData():
 	'''
 	'''
 	def __init__(self, data={}):
-		self._data = data
+		self._data  = data
+		self._shm   = None
+		self._index = None
+
+	def __reduce_ex__(self,protocol):
+		# Databases on shared memory travel by name
+		if self._shm is not None:
+			return (HGSData.attach,(self._shm.name,))
+		return super(HGSData,self).__reduce_ex__(protocol)
 
 	def __len__(self):
 		return len(self._data['name'])
@@ -44,13 +94,116 @@ class HGSData():
 		Set the value of a variable given its key
 		'''
 		self._data[key] = value
+		self._index     = None
 
 	# -- IDs --
 	def id(self,species,raise_error=True):
 		'''
 		Run hgs_id
 		'''
-		return hgs_id(species,self._data,raise_error=raise_error)
+		return hgs_id(species,self,raise_error=raise_error)
+
+	def lookup(self,name):
+		'''
+		Id of a species or mixture name, None if it does not exist
+		'''
+		if self._index is None: self.update_index()
+		ids = self._index['name'].get(name,None)
+		if ids is None:
+			ids = self._index['comb'].get(name,None)
+			if ids is not None: ids += len(self)
+		return ids
+
+	def element_index(self):
+		'''
+		Sparse element by species index, the ids of the species that
+		have each element and the elements of each species
+		'''
+		if self._index is None: self.update_index()
+		return self._index['elem'], self._index['ena']
+
+	def mixture_vector(self,k):
+		'''
+		Sparse expansion vector of the k-th mixture, the ids of
+		its species and their molar fraction
+		'''
+		if self._index is None: self.update_index()
+		return self._index['mix'][k]
+
+	def search_index(self,complete=False):
+		'''
+		Search structures over the names (complete names if complete
+		is True) followed by the mixtures for hgs_find. The names are
+		used if the database has no complete names.
+		'''
+		if self._index is None: self.update_index()
+		complete = complete and len(self._data['nameback']) > 0
+		key = 'search_complete' if complete else 'search'
+		if not key in self._index:
+			names = self._data['nameback'] if complete else self._data['name']
+			self._index[key] = build_search(list(names) + list(self._data['comb']),self._data['ena'],self._data['nat'])
+		return self._index[key]
+
+	def digest(self,ids=None):
+		'''
+		Content hash (hexadecimal) of the database or, if ids is given,
+		of that subset of species. It is kept up to date by the functions
+		that modify the database (add, subt, merge_thermo, append_dict).
+		'''
+		if self._index is None: self.update_index()
+		if ids is None and 'hash' in self._index: return self._index['hash']
+		h = hashlib.sha256()
+		for ii in (range(len(self)) if ids is None else ids):
+			if not ii in self._index['digest']:
+				self._index['digest'][ii] = species_digest(self._data,ii)
+			h.update(self._index['digest'][ii])
+		if ids is None:
+			h.update(repr((self._data['comb'],self._data['cspec'],[list(c) for c in self._data['cper']])).encode())
+			self._index['hash'] = h.hexdigest()
+		return h.hexdigest()
+
+	def stamp(self,ids=None):
+		'''
+		Version stamp of the results obtained with this database
+		'''
+		return {'hgspy':__version__,'database':self.digest(ids)}
+
+	def update_index(self,ids=None,mixtures=True):
+		'''
+		Update the indexes of the database. If ids is given, only
+		these species (new or modified) are indexed, otherwise all
+		the indexes are built again.
+		'''
+		if ids is not None and self._index is None: return # Built on the next lookup
+		if ids is None:
+			self._index = {'name':{},'comb':{},'elem':{},'ena':{},'digest':{}}
+			ids = range(len(self))
+		for ii in ids:
+			# Names, the first species with a name is the one found
+			self._index['name'].setdefault(self._data['name'][ii],ii)
+			# Elements, sparse element by species index
+			for e in self._index['ena'].get(ii,()):
+				self._index['elem'][e].discard(ii)
+			self._index['ena'][ii] = frozenset(self._data['ena'][ii])
+			for e in self._index['ena'][ii]:
+				self._index['elem'].setdefault(e,set()).add(ii)
+			# Content hash of the species, computed again on demand
+			self._index['digest'].pop(ii,None)
+		# Search structures and database hash are built again on demand
+		if len(ids) > 0 or mixtures:
+			self._index.pop('search',None)
+			self._index.pop('search_complete',None)
+			self._index.pop('hash',None)
+		# Mixtures and their expansion vectors (species ids and fractions)
+		if mixtures:
+			self._index['comb'] = {}
+			for ii,n in enumerate(self._data['comb']):
+				self._index['comb'].setdefault(n,ii)
+			self._index['mix'] = [(
+				np.array([self._index['name'][s] for s in cspec],np.int64),
+				np.array(cper,np.double)/100.
+				) for cspec,cper in zip(self._data['cspec'],self._data['cper'])
+			]
 
 	# -- Add, remove and rebuild --
 	def add(self,name,species,percent):
@@ -71,12 +224,69 @@ class HGSData():
 		'''
 		return hgs_rebuild(species,n,T,self)
 
+	def find(self,name,complete=False,mode='substring',verbose=True):
+		'''
+		Run hgs_find
+		'''
+		return hgs_find(name,complete,self,mode,verbose)
+
 	def print_info(self,name):
 		'''
 		Run hgs_print_info
 		'''
 		hgs_print_info(name,self)
 
+	def candidates(self,elements,states=('G',),T_range=None):
+		'''
+		Run hgs_candidates
+		'''
+		return hgs_candidates(elements,states,T_range,self)
+
+	# -- Merge --
+	def merge_thermo(self,fname,on_conflict='error',overlay=None):
+		'''
+		Run hgs_merge_thermo, the merged species are stored on
+		the overlay file if given (see load)
+		'''
+		return hgs_merge_thermo(fname,on_conflict,overlay,self)
+
+	# -- Subsets --
+	def subset(self,species,elements=False):
+		'''
+		Small self contained database with the given species (mixtures
+		are expanded to their species) or, if elements is True, with all
+		the species made only of the given elements. The species keep
+		their relative order and are indexed again from 0, and the
+		mixtures whose species are all on the subset are kept.
+		'''
+		if type(species) is str: species = [species]
+		if elements:
+			ids = self.id(self.candidates(species,states=None))
+		else:
+			ids = set()
+			for q in self.id(list(species)):
+				if q < len(self):
+					ids.add(q)
+				else:
+					ids.update(self.id(self._data['cspec'][q-len(self)]))
+			ids = sorted(ids)
+		names = set(self._data['name'][ii] for ii in ids)
+		mixts = [ii for ii,cspec in enumerate(self._data['cspec']) if set(cspec) <= names]
+		return HGSData.new(
+			name     = [self._data['name'][ii]          for ii in ids],
+			nameback = [self._data['nameback'][ii]      for ii in ids] if len(self._data['nameback']) > 0 else [],
+			state    = [self._data['state'][ii]         for ii in ids],
+			lim      = [list(self._data['lim'][ii])     for ii in ids],
+			ena      = [list(self._data['ena'][ii])     for ii in ids],
+			nat      = [list(self._data['nat'][ii])     for ii in ids],
+			lv       = [np.array(self._data['lv'][ii])  for ii in ids],
+			hv       = [np.array(self._data['hv'][ii])  for ii in ids],
+			mm       = [float(self._data['mm'][ii])     for ii in ids],
+			comb     = [self._data['comb'][ii]          for ii in mixts],
+			cspec    = [list(self._data['cspec'][ii])   for ii in mixts],
+			cper     = [list(self._data['cper'][ii])    for ii in mixts],
+		)
+
 	# -- Properties --
 	def coefs(self,ids,T,all=False):
 		"""
@@ -267,6 +477,59 @@ class HGSData():
 		"""
 		return self.h(ids,T) - T*self.s(ids,T,P,Pref=Pref) # [kJ/mol]
 
+	# -- Arrays --
+	def coefs_array(self,ids,T):
+		'''
+		NASA polynomials of a block of species, each one at
+		its own temperature, as a (len(ids),7) array
+		'''
+		T = np.asarray(T,np.double)*np.ones((len(ids),))
+		return select_coefs(T,*self.coefs_block(ids),lambda ii: self._data['name'][ids[ii]])
+
+	def coefs_block(self,ids):
+		'''
+		Temperature limits (len(ids),3) and low and high temperature
+		NASA polynomials (len(ids),7) of a block of species
+		'''
+		return (
+			np.array([self._data['lim'][i] for i in ids],np.double).reshape(-1,3),
+			np.array([self._data['lv'][i] for i in ids],np.double).reshape(-1,7),
+			np.array([self._data['hv'][i] for i in ids],np.double).reshape(-1,7),
+		)
+
+	def mm_array(self,ids):
+		'''
+		Molar masses of a block of species [g/mol]
+		'''
+		return np.array([self._data['mm'][i] for i in ids],np.double)
+
+	def gas_array(self,ids):
+		'''
+		Whether each species of a block is a gas
+		'''
+		return np.array([self._data['state'][i] == 'G' for i in ids],bool)
+
+	def in_range(self,ids,T):
+		'''
+		Whether each species of a block, each one at its own
+		temperature, is within the limits of its NASA polynomials
+		'''
+		T   = np.asarray(T,np.double)*np.ones((len(ids),))
+		lim = self.coefs_block(ids)[0]
+		return (lim[:,0] <= T) & (T <= lim[:,2])
+
+	def elements(self,ids):
+		'''
+		Elements present on a block of species (sorted) and the
+		element by species matrix of number of atoms
+		'''
+		elems = np.unique([e for i in ids for e in self._data['ena'][i]]).tolist()
+		A     = np.zeros((len(elems),len(ids)),np.double)
+		for jj,q in enumerate(ids):
+			for e,nat in zip(self._data['ena'][q],self._data['nat'][q]):
+				A[elems.index(e),jj] = nat
+		return elems, A
+
 	# -- Utilities --
 	def append_dict(self,d):
 		'''
@@ -274,6 +537,8 @@ class HGSData():
 		'''
 		for key in d.keys():
 			self._data[key].append(d[key])
+		if 'name' in d.keys() and self._index is not None:
+			self.update_index([len(self)-1],mixtures=False)
 
 	def save(self,fname=HGSDATA):
 		'''
@@ -284,14 +549,109 @@ class HGSData():
 		file.close()
 
 	@classmethod
-	def load(cls,fname=HGSDATA):
+	def load(cls,fname=HGSDATA,overlay=None):
 		'''
-		Load HGS data
+		Load HGS data and, if given and it exists, an overlay
+		file of species merged by merge_thermo
 		'''
 		file = open(fname,'rb')
 		data = pkl.load(file)
 		file.close()
-		return cls(data=data)
+		out  = cls(data=data)
+		if overlay is not None and os.path.isfile(overlay):
+			file = open(overlay,'rb')
+			hgs_merge_species(pkl.load(file),'replace',out)
+			file.close()
+		return out
+
+	# -- Shared memory --
+	def to_shared(self,name=None):
+		'''
+		Copy the database to a shared memory block and return
+		a database that lives on it.
+
+		The coefficients, limits and molar masses are mapped read-only
+		with no copy by any process that attaches to the block (see
+		attach). The species and mixture names are stored next to them.
+		The returned database owns the block, call unlink() on it when
+		it is no longer needed.
+		'''
+		from multiprocessing import shared_memory
+		ns    = len(self)
+		meta  = pkl.dumps({key:self._data[key] for key in self._data.keys() if key not in SHARED_KEYS})
+		start = 16 + 8*((len(meta)+7)//8)
+		size  = start + 8*ns*sum(SHARED_KEYS.values())
+		shm   = shared_memory.SharedMemory(name=name,create=True,size=size)
+		shm.buf[:16]             = np.array([len(meta),ns],np.int64).tobytes()
+		shm.buf[16:16+len(meta)] = meta
+		for key,arr in _shared_arrays(shm.buf,start,ns).items():
+			arr[:] = np.array(self._data[key],np.double).reshape(arr.shape)
+		return HGSData._from_shared(shm)
+
+	@classmethod
+	def attach(cls,name):
+		'''
+		Attach to a database stored in shared memory by to_shared
+
+		The block belongs to the process that created it, so it is not
+		registered with the resource tracker here (otherwise the tracker
+		would warn about it and unlink it when this process exits).
+		'''
+		from multiprocessing import shared_memory, resource_tracker
+		try:
+			shm = shared_memory.SharedMemory(name=name,track=False) # Python >= 3.13
+		except TypeError:
+			# Unregistering afterwards would also drop the registration of
+			# the creator when the tracker is shared, so skip it instead
+			register = resource_tracker.register
+			resource_tracker.register = lambda name, rtype: None
+			try:
+				shm = shared_memory.SharedMemory(name=name)
+			finally:
+				resource_tracker.register = register
+		return cls._from_shared(shm)
+
+	@classmethod
+	def _from_shared(cls,shm):
+		'''
+		Build the database that lives on a shared memory block
+		'''
+		lmeta, ns = np.frombuffer(shm.buf[:16],np.int64)
+		data  = pkl.loads(bytes(shm.buf[16:16+lmeta]))
+		start = 16 + 8*((int(lmeta)+7)//8)
+		for key,arr in _shared_arrays(shm.buf,start,int(ns)).items():
+			arr.flags.writeable = False
+			data[key] = arr
+		out      = cls(data=data)
+		out._shm = shm
+		return out
+
+	@property
+	def shared_name(self):
+		'''
+		Name of the shared memory block or None
+		'''
+		return self._shm.name if self._shm is not None else None
+
+	def close(self):
+		'''
+		Detach from the shared memory block
+		'''
+		if self._shm is not None:
+			# Keep a private copy of the data
+			for key in SHARED_KEYS.keys():
+				self._data[key] = [np.array(v) for v in self._data[key]] if self._data[key].ndim > 1 else self._data[key].tolist()
+			self._shm.close()
+			self._shm = None
+
+	def unlink(self):
+		'''
+		Detach and destroy the shared memory block
+		'''
+		if self._shm is not None:
+			shm = self._shm
+			self.close()
+			shm.unlink()
 
 	@classmethod
 	def new(cls,name=[],nameback=[],state=[],lim=[],ena=[],nat=[],lv=[],
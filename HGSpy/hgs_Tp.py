@@ -14,6 +14,7 @@ import numpy as np
 
 from .hgs        import HGSData
 from .cr         import cr
+from .hgs_cache  import disk_cached
 from .utils      import raiseError
 from .hgs_prop   import hgs_prop_ids
 from .hgs_eq     import options as opt_eq
@@ -32,6 +33,7 @@ def hgs_Tp_ids(ids, n0, typ, V0, P, flow, solver, Tstar, opt_eq, opt_sci, opt_se
 	return Tp, n, flag
 
 @cr('HGS.Tp')
+@disk_cached('HGS.Tp')
 def hgs_Tp(species, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=3000, 
 	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
 	"""
@@ -54,7 +56,9 @@ def hgs_Tp(species, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=
 	V0 --> Entry that should be for type:'T'   V0=T [K] input temperature
 										 'H'   V0=H [kJ] input enthalpy
 	P --> [bar] Mixture pressure
-	**kwargs --> opt_eq = Options for the minimize Scipy function
+	**kwargs --> solver= 'hgs_secant' (default) or 'hgs_eq' to solve the temperature
+				 together with the equilibrium composition (shifting flow)
+				 opt_eq = Options for the minimize Scipy function
 				 opt_sec= Dictionary with the options for the secant method.
 						"xmin": [K] Temperature minimum for the solver;
 						"xmax" [K] Temperature maximum for the solver;
@@ -101,4 +105,58 @@ def hgs_Tp(species, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=
 	Tp, n, flag = hgs_Tp_ids(ids, n0, typ, V0, P, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data)
 
 	# Return output
-	return Tp, n, species, flag
\ No newline at end of file
+	return Tp, n, species, flag
+
+def hgs_Tp_iter(species, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=3000, 
+	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	for point in hgs_Tp_iter(species, n0, tipo, V0, P, **kwargs):
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_Tp_iter sweeps hgs_tp over M points and yields the result of each
+	point as soon as it is computed, without writing to the console. The
+	temperature of each point is the initial guess (Tstar) of the next one.
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	species --> String or numbers of species
+	n0 --> [mols] (N,) or (M,N) Number of mols of each species for each point
+	type --> Entry type that defines the state of the input.
+			 It can be 'T' or 'H'
+	V0 --> Scalar or (M,) entry of each point, for type:'T' V0=T [K] input temperature
+														'H' V0=H [kJ] input enthalpy
+	P --> [bar] Scalar or (M,) mixture pressure of each point
+	**kwargs --> Same as hgs_tp
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs (yielded for each point):
+	-----------------------------------------------------------------------------
+	point --> Dictionary with the keys 'point' (position on the sweep),
+			  'n0', 'V0', 'P', 'Tp', 'n', 'species' and 'flag' (as in hgs_tp)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	if typ not in ['H','T']: raiseError(f'Wrong type = {typ}')
+	n0 = np.atleast_2d(np.asarray(n0,np.double))
+	V0 = np.atleast_1d(np.asarray(V0,np.double))
+	P  = np.atleast_1d(np.asarray(P,np.double))
+	npoints = max(n0.shape[0],len(V0),len(P))
+	n0, V0, P = [np.broadcast_to(a,(npoints,)+a.shape[1:]) for a in (n0,V0,P)]
+
+	ids = hgs_data.id(species)
+	for ii in range(npoints):
+		sp, ni, Vi, idi = species, n0[ii], [V0[ii]]*len(species), ids
+		# Rebuild mixtures
+		if np.max(ids) >= len(hgs_data):
+			sp, ni, Vi = hgs_data.rebuild(species,ni,Vi)
+			idi        = hgs_data.id(sp)
+		Tp, n, flag = hgs_Tp_ids(idi,ni,typ,Vi,P[ii],flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+		if flag == 1: Tstar = Tp
+		yield {'point':ii,'n0':n0[ii],'V0':V0[ii],'P':P[ii],'Tp':Tp,'n':n,'species':sp,'flag':flag}
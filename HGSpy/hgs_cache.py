@@ -0,0 +1,182 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS result caches
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import os, zlib, pickle, hashlib, inspect, tempfile, functools, numpy as np
+from collections import OrderedDict
+
+from .utils import OPTS
+
+
+class LRUCache(object):
+	'''
+	Least recently used cache bounded by a number of entries,
+	with hit and miss statistics
+	'''
+	def __init__(self,maxsize=0):
+		self._data    = OrderedDict()
+		self._maxsize = maxsize
+		self._hits    = 0
+		self._misses  = 0
+
+	def __len__(self):
+		return len(self._data)
+
+	def __str__(self):
+		return 'LRU cache hits %d misses %d size %d maxsize %d' % (self._hits,self._misses,len(self),self._maxsize)
+
+	def get(self,key):
+		'''
+		Value of a key, None if it is not stored
+		'''
+		if key in self._data:
+			self._data.move_to_end(key)
+			self._hits += 1
+			return self._data[key]
+		self._misses += 1
+		return None
+
+	def put(self,key,value):
+		'''
+		Store a value dropping the least recently used
+		entries if the cache is full
+		'''
+		self._data[key] = value
+		self._data.move_to_end(key)
+		self.resize(self._maxsize)
+
+	def resize(self,maxsize):
+		'''
+		Change the maximum number of entries
+		'''
+		self._maxsize = maxsize
+		while len(self._data) > max(maxsize,0):
+			self._data.popitem(last=False)
+
+	def clear(self):
+		'''
+		Remove all the entries and reset the statistics
+		'''
+		self._data.clear()
+		self._hits   = 0
+		self._misses = 0
+
+	def info(self):
+		'''
+		Statistics of the cache
+		'''
+		return {'hits':self._hits,'misses':self._misses,'size':len(self),'maxsize':self._maxsize}
+
+
+# Cache of equilibrium results, enabled with set_options('eq_cache',maxsize)
+EQCACHE = LRUCache()
+
+def rounded(values,digits):
+	'''
+	Values rounded to a number of significant digits as a tuple
+	'''
+	return tuple(float('%.*g' % (digits,v)) for v in np.ravel(values))
+
+def eq_key(ids, T, P, b, options, hgs_data):
+	'''
+	Key of an equilibrium problem from its database and species,
+	rounded temperature and pressure and rounded element totals
+	'''
+	digits = OPTS['eq_cache_digits']
+	return (hgs_data.digest(ids),tuple(int(q) for q in ids),rounded(T,digits),rounded(P,digits),
+		rounded(b,digits),repr(sorted(options.items())))
+
+def eq_cache_info():
+	'''
+	Hits, misses, size and maximum size of the equilibrium cache
+	'''
+	return EQCACHE.info()
+
+def eq_cache_clear():
+	'''
+	Empty the equilibrium cache
+	'''
+	EQCACHE.clear()
+
+
+# Persistent cache, enabled with set_options('disk_cache',directory).
+# The results are stored with pickle, so the directory must be trusted:
+# loading a file written by someone else can run arbitrary code.
+DISK_EXT = '.hgc'
+
+def disk_key(name, arguments, hgs_data):
+	'''
+	Content address of a call from the function name, its
+	arguments (options included) and the database
+	'''
+	args = {k:(v.tolist() if isinstance(v,np.ndarray) else v) for k,v in arguments.items()}
+	return hashlib.sha256(pickle.dumps((name,sorted(args.items()),hgs_data.stamp()),protocol=4)).hexdigest()
+
+def disk_evict(path, maxsize):
+	'''
+	Remove the least recently used results until the
+	cache is under its maximum size [bytes]
+	'''
+	files = [os.path.join(path,f) for f in os.listdir(path) if f.endswith(DISK_EXT)]
+	files = sorted(((os.stat(f).st_mtime,os.stat(f).st_size,f) for f in files),reverse=True)
+	size  = 0
+	for _,fsize,fname in files:
+		size += fsize
+		if size > maxsize: os.remove(fname)
+
+def disk_cached(name):
+	'''
+	Decorator that stores the results of a function on the
+	persistent cache. The function must take hgs_data.
+	'''
+	def decorator(func):
+		signature = inspect.signature(func)
+		@functools.wraps(func)
+		def wrapper(*args,**kwargs):
+			path = OPTS['disk_cache']
+			if path is None: return func(*args,**kwargs)
+			# Content address of the call
+			call = signature.bind(*args,**kwargs)
+			call.apply_defaults()
+			arguments = dict(call.arguments)
+			fname = os.path.join(path,disk_key(name,arguments,arguments.pop('hgs_data'))+DISK_EXT)
+			# Stored result, its time is updated to keep track of the use.
+			# A file that cannot be decoded is a miss and it is removed.
+			if os.path.isfile(fname):
+				file = open(fname,'rb')
+				data = file.read()
+				file.close()
+				try:
+					out = pickle.loads(zlib.decompress(data))
+					os.utime(fname)
+					return out
+				except Exception:
+					os.remove(fname)
+			out = func(*args,**kwargs)
+			# Written to a temporary file and renamed, so that a result
+			# is never read half written
+			os.makedirs(path,exist_ok=True)
+			fd, ftmp = tempfile.mkstemp(dir=path,suffix='.tmp')
+			file = os.fdopen(fd,'wb')
+			file.write(zlib.compress(pickle.dumps(out,protocol=4)))
+			file.close()
+			os.replace(ftmp,fname)
+			disk_evict(path,OPTS['disk_cache_size'])
+			return out
+		return wrapper
+	return decorator
+
+def disk_cache_clear():
+	'''
+	Empty the persistent cache
+	'''
+	path = OPTS['disk_cache']
+	if path is not None and os.path.isdir(path): disk_evict(path,0)
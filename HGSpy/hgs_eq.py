@@ -13,21 +13,56 @@ from __future__ import print_function, division
 import numpy as np
 from scipy.optimize import minimize, Bounds
 
-from .cr       import cr
-from .hgs      import HGSData
-from .utils    import raiseError, raiseWarning
-from .hgs_prop import hgs_prop_ids
+from .cr          import cr
+from .hgs         import HGSData
+from .utils       import OPTS, raiseError, raiseWarning
+from .hgs_cache   import EQCACHE, eq_key, disk_cached
+from .hgs_prop    import hgs_prop_ids, partial, cp_nasa, h_nasa, s_nasa
+from .definitions import R
 
 
 options = {
 	'method':'SLSQP',
 	'tol':1e-9,
 	'options':{'disp':False},
+	'prune':None,      # Mole fraction under which species are dropped (None to not prune)
+	'prune_iter':20,   # Iterations before the first pruning
+	'prune_loops':10,  # Maximum number of prune and re-admit passes
+	'newton_maxiter':100, # Maximum Newton iterations for HP and SP equilibrium
+	'newton_tol':0.5e-5,  # Tolerance on the mols for HP and SP equilibrium
 }
 
 
+def independent_rows(A):
+	'''
+	Rows of a matrix that are linearly independent
+	'''
+	rows = []
+	for ii in range(A.shape[0]):
+		if np.linalg.matrix_rank(A[rows+[ii],:]) > len(rows): rows.append(ii)
+	return rows
+
+
+def evaluable(ids, n, T, hgs_data):
+	'''
+	Species with mols or within their temperature range, the rest (out of
+	range without mols, f.e. a liquid above its limit) are excluded
+	'''
+	return (np.asarray(n) > 0) | hgs_data.in_range(ids,T)
+
+
+def evaluable_prop(ids, n, T, P, props, hgs_data):
+	'''
+	Properties of a mixture (hgs_prop_ids) evaluated on its evaluable species
+	'''
+	ids, n = np.asarray(ids), np.asarray(n,np.double)
+	T   = np.asarray(T,np.double)*np.ones((len(ids),))
+	use = evaluable(ids,n,T,hgs_data)
+	return hgs_prop_ids(ids[use],n[use],T[use],P,props,hgs_data)
+
+
 # Parameters minimization
-def parameters_min(ids, n0, hgs_data):
+def parameters_min(ids, n0, hgs_data, b=None):
 	"""
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
@@ -42,6 +77,7 @@ def parameters_min(ids, n0, hgs_data):
 	-----------------------------------------------------------------------------
 	id --> Id of species
 	n0 --> [mol] Species mols
+	b --> [mol] Atoms of each element (dictionary), computed from n0 if None
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Outputs:
@@ -57,60 +93,410 @@ def parameters_min(ids, n0, hgs_data):
 	# Bounds
 	bounds = Bounds([0]*len(ids),[np.inf]*len(ids))
 
-	# Equality
-	Elems = np.unique([e for i in ids for e in hgs_data['ena'][i]])
-
-	Aeq = np.zeros((len(Elems),len(ids)),np.double)
-	beq = np.zeros((len(Elems),),np.double)
-
-	for ii,e in enumerate(Elems):
-		for jj,q in enumerate(ids):
-			for kk,ee in enumerate(hgs_data['ena'][q]):
-				if ee == e:
-					beq[ii]    += n0[jj]*hgs_data['nat'][q][kk]
-					Aeq[ii][jj] = hgs_data['nat'][q][kk]
+	# Equality, the linearly dependent elements (f.e. H and O when
+	# water is the only species with them) are dropped
+	elems, Aeq = hgs_data.elements(ids)
+	if b is None:
+		# Species by species, in the same order as the element totals were always summed
+		beq = np.zeros((len(elems),),np.double)
+		for jj in range(len(ids)): beq += Aeq[:,jj]*n0[jj]
+	else:
+		beq = np.array([b[e] for e in elems],np.double)
+	keep       = independent_rows(Aeq)
+	Aeq, beq   = Aeq[keep,:], beq[keep]
 
 	linear = {"type": "eq","fun": lambda x: np.dot(Aeq,x) - beq}
 	return bounds, linear
 
 
-def hgs_eq_ids(ids, n0, T, P, options, hgs_data):
+def potentials(ids, n, T, P, hgs_data):
 	'''
-	Main function for hgs_eq working with ids instead of species
+	Dimensionless chemical potential (mu/RT) of each species, the species
+	without mols are evaluated at the reference pressure
+	'''
+	a   = hgs_data.coefs_array(ids,T)
+	P_i = partial(n,P,ids,hgs_data) if np.any(n > 0) else np.zeros((len(ids),))
+	return (h_nasa(a,T) - T*s_nasa(a,T,P_i))/(R*T)
+
+
+def prune(act, n, A, b, threshold, lock):
+	'''
+	Active species that stay after dropping the ones with a mole fraction
+	under the threshold (except the locked ones). The species with more
+	mols of an element is kept so that all the elements remain on the problem.
+	'''
+	keep = act & ((n >= threshold*np.sum(n)) | lock)
+	for ee in np.where(b != 0)[0]:
+		has = act & (A[ee,:] != 0)
+		if not np.any(keep & has): keep[np.argmax(np.where(has,n,-1.))] = True
+	return keep
+
+
+def readmit(act, ids, n, T, P, A, threshold, hgs_data):
+	'''
+	Mole fraction estimated from the element potentials of the active
+	species for the inactive species that should be present at equilibrium
+	(0 for the rest)
+	'''
+	out = np.zeros((len(ids),),np.double)
+	ina = np.where(~act)[0]
+	if len(ina) == 0: return out
+	# Element potentials from the species present, weighted by their amount
+	# as the potentials of the minor species are less accurate
+	ii  = np.where(act & (n > 0))[0]
+	w   = np.sqrt(n[ii]/np.sum(n))
+	pi  = np.linalg.lstsq(w[:,None]*A[:,ii].T,w*potentials(ids[ii],n[ii],T[ii],P,hgs_data),rcond=None)[0]
+	# Test on the inactive species, only if they are made of the active elements
+	ina = ina[~np.any(A[:,ina][np.all(A[:,act] == 0,axis=1),:] != 0,axis=0)]
+	if len(ina) == 0: return out
+	mu0 = potentials(ids[ina],np.zeros((len(ina),)),T[ina],P,hgs_data)
+	dmu = np.dot(A[:,ina].T,pi) - mu0
+	gas = hgs_data.gas_array(ids[ina])
+	x   = np.where(gas,np.exp(np.minimum(dmu - np.log(P),0.)),threshold)
+	out[ina] = np.where(np.where(gas,x > threshold,dmu > 0),x,0.)
+	return out
+
+
+def minimize_G(ids, n0, T, P, b, options, hgs_data, maxiter=None, jac=False):
+	'''
+	Minimize the Gibbs free energy of a set of species, the gradient
+	of G are the chemical potentials of the species if jac is True
 	'''
 	# Function to minimize
 	minG = lambda x: hgs_prop_ids(ids,x,T,P,['g'],hgs_data)[0]
+	grad = lambda x: R*T*potentials(ids,x,T,P,hgs_data)
 
 	# Function minimization parameter
-	bounds, linear = parameters_min(ids,n0,hgs_data)
-	res = minimize(minG,n0,method=options['method'],tol=options['tol'],
-				   constraints=linear,options=options['options'],bounds=bounds)
+	bounds, linear = parameters_min(ids,n0,hgs_data,b)
+	opt = options['options'] if maxiter is None else dict(options['options'],maxiter=maxiter)
+	return minimize(minG,n0,method=options['method'],tol=options['tol'],jac=grad if jac else None,
+				   constraints=linear,options=opt,bounds=bounds)
+
 
-	if not res.success:
+def hgs_eq_ids(ids, n0, T, P, options, hgs_data):
+	'''
+	Main function for hgs_eq working with ids instead of species
+	'''
+	if OPTS['eq_cache'] <= 0:
+		return solve_eq(ids,n0,T,P,options,hgs_data)
+	# Equilibrium cache
+	EQCACHE.resize(OPTS['eq_cache'])
+	_, A = hgs_data.elements(ids)
+	key  = eq_key(ids,T,P,np.dot(A,n0),options,hgs_data)
+	out  = EQCACHE.get(key)
+	if out is None:
+		out = solve_eq(ids,n0,T,P,options,hgs_data)
+		EQCACHE.put(key,(np.array(out[0]),out[1]))
+	return np.array(out[0]), out[1]
+
+
+def solve_eq(ids, n0, T, P, options, hgs_data):
+	'''
+	Minimization of the Gibbs free energy for hgs_eq_ids
+	'''
+	# The species out of their temperature range can not be present
+	use = evaluable(ids,n0,T,hgs_data)
+	if not np.all(use):
+		ids, n0, T = np.asarray(ids), np.asarray(n0,np.double), np.asarray(T,np.double)*np.ones((len(ids),))
+		n = np.zeros((len(ids),),np.double)
+		n[use], G = solve_eq(ids[use],n0[use],T[use],P,options,hgs_data)
+		return n, G
+
+	threshold = options.get('prune',None)
+	if threshold is None:
+		res = minimize_G(ids,n0,T,P,None,options,hgs_data)
+		if not res.success:
+			raiseWarning("Ups,... minimize has failed in hgs_eq.")
+		return res.x, res.fun
+
+	# Active set: every few iterations the species under the threshold are
+	# dropped, and at convergence they are re-admitted if their chemical
+	# potential is under the one given by the element potentials
+	ids = np.asarray(ids)
+	n   = np.array(n0,np.double)
+	T   = np.asarray(T,np.double)*np.ones((len(ids),))
+	elems, A = hgs_data.elements(ids)
+	b   = np.dot(A,n)
+	act = np.ones((len(ids),),bool)
+	lck = np.zeros((len(ids),),bool) # Re-admitted species are not dropped again
+	for _ in range(options.get('prune_loops',10)):
+		# Short runs until some species is re-admitted, then complete runs
+		maxiter = options.get('prune_iter',None) if not np.any(lck) else None
+		res = minimize_G(ids[act],n[act],T[act],P,dict(zip(elems,b)),options,hgs_data,maxiter,jac=True)
+		n[:] = 0.; n[act] = res.x
+		# A line search that can not improve from a restart is also converged
+		done = res.success or res.status == 8
+		# Drop the negligible species
+		keep = prune(act,n,A,b,threshold,lck)
+		if np.any(act != keep) or not done:
+			act = keep; n[~act] = 0.
+			continue
+		# Re-admit the species that should be present
+		x   = readmit(act,ids,n,T,P,A,threshold,hgs_data)
+		new = x > 0
+		if not np.any(new): break
+		act |= new; lck |= new; n[new] = x[new]*np.sum(n)
+	else:
+		res = minimize_G(ids[act],n[act],T[act],P,dict(zip(elems,b)),options,hgs_data,jac=True)
+		n[:] = 0.; n[act] = res.x
+		done = res.success or res.status == 8
+
+	if not done:
 		raiseWarning("Ups,... minimize has failed in hgs_eq.")
 
-	return res.x, res.fun
+	return n, res.fun
+
+def eq_sensitivity(ids, n, T, P, hgs_data):
+	'''
+	Derivatives of the equilibrium mols with respect to the temperature
+	[mol/K], the pressure [mol/bar] and the initial mols (N,N) from the
+	linearized KKT conditions at the converged state (implicit function
+	theorem): mu_j/RT = sum(a_ij*pi_i) for the species present and the
+	element balance
+	'''
+	ids  = np.asarray(ids)
+	n    = np.asarray(n,np.double)
+	T    = np.asarray(T,np.double)*np.ones((len(ids),))
+	_, A = hgs_data.elements(ids)
+	gas  = hgs_data.gas_array(ids)
+	prs  = n > 0
+	A    = A[np.any(A[:,prs] != 0,axis=1),:]
+	A    = A[independent_rows(A[:,prs]),:]
+	ip   = np.where(prs)[0]
+	H    = np.zeros((len(ids),),np.double)
+	H[ip] = h_nasa(hgs_data.coefs_array(ids[ip],T[ip]),T[ip])/(R*T[ip]) # H/RT
+	gp   = gas[ip]
+	ng   = np.sum(n[gas])
+	npr, ne = len(ip), A.shape[0]
+	# Rows of the species present (gases scaled by their mols) and the elements
+	M    = np.zeros((npr+ne,npr+ne),np.double)
+	M[:npr,:npr]  = np.diag(gp.astype(np.double))
+	M[:npr,:npr] -= np.outer(np.where(gp,n[ip],0.)/ng,gp)
+	M[:npr,npr:]  = -np.where(gp,n[ip],1.)[:,None]*A[:,ip].T
+	M[npr:,:npr]  = A[:,ip]
+	rhs  = np.zeros((npr+ne,2+len(ids)),np.double)
+	rhs[:npr,0]   = np.where(gp,n[ip],1.)*H[ip]/T[ip] # Temperature
+	rhs[:npr,1]   = np.where(gp,-n[ip]/P,0.)          # Pressure
+	rhs[npr:,2:]  = A                                 # Initial mols
+	x    = np.linalg.lstsq(M,rhs,rcond=None)[0]
+	dn   = np.zeros((len(ids),2+len(ids)),np.double)
+	dn[ip,:] = x[:npr,:]
+	return dn[:,0], dn[:,1], dn[:,2:]
+
+
+def newton_step(A, b0, n, ntot, T, P, vol, typ, V0, coefs, gas, cnd):
+	'''
+	Newton step of the Gordon & McBride equations (NASA RP-1311) for HP,
+	SP (fixed pressure P [bar]), TV and UV (fixed volume vol [m^3])
+	equilibrium. The unknowns are the element potentials, the mols of the
+	condensed species included (cnd), the total mols of gas (HP and SP)
+	and the temperature (not TV). Returns the corrections of ln(n_j) of
+	the gases, n_j of the condensed species, ln(n) and ln(T), and the
+	dimensionless chemical potentials.
+	'''
+	fixP = typ in ['H','S']
+	a    = coefs(T)
+	H    = h_nasa(a,T)/(R*T)              # H/RT
+	Cp   = cp_nasa(a,T)/R                 # Cp/R
+	S    = s_nasa(a,T,np.ones_like(n))/R  # S0/R
+	lnP  = np.zeros_like(n)               # Unit activity of the condensed species
+	lnP[gas] = np.log(n[gas]/ntot) + np.log(P) if fixP else np.log(n[gas]*R*T/(1e2*vol))
+	mu   = H - S + lnP                    # mu/RT
+	E    = H - (gas & (not fixP))         # -dmu/dlnT, U/RT of the gases at fixed volume
+	Ce   = Cp - (gas & (not fixP))        # Cv/R of the gases at fixed volume
+	W    = S - lnP if typ == 'S' else E   # Weights of the energy row
+	An   = A[:,gas]*n[gas]
+	ne, nc = A.shape[0], np.sum(cnd)
+	iN, iT = ne + nc, ne + nc + fixP      # Position of ln(n) and ln(T)
+	nu   = iT + (typ != 'T')
+	M    = np.zeros((nu,nu),np.double)
+	rhs  = np.zeros((nu,),np.double)
+	# Element and condensed species rows
+	M[:ne,:ne]      = np.dot(An,A[:,gas].T)
+	M[:ne,ne:iN]    = A[:,cnd]
+	M[ne:iN,:ne]    = A[:,cnd].T
+	rhs[:ne]        = b0 - np.dot(A,n) + np.dot(An,mu[gas])
+	rhs[ne:iN]      = mu[cnd]
+	# Total mols of gas row
+	if fixP:
+		M[:ne,iN]   = np.sum(An,axis=1)
+		M[iN,:ne]   = np.sum(An,axis=1)
+		M[iN,iN]    = np.sum(n[gas]) - ntot
+		rhs[iN]     = ntot - np.sum(n[gas]) + np.dot(n[gas],mu[gas])
+	# Energy row
+	if typ != 'T':
+		ph = gas | cnd
+		M[:ne,iT]   = np.dot(An,E[gas])
+		M[ne:iN,iT] = E[cnd]
+		M[iT,:ne]   = np.dot(An,W[gas])
+		M[iT,ne:iN] = W[cnd]
+		M[iT,iT]    = np.dot(n[ph],Ce[ph]) + np.dot(n[gas],E[gas]*W[gas])
+		rhs[iT]     = V0/R - np.dot(n[ph],W[ph]) + np.dot(n[gas],W[gas]*mu[gas])
+		if typ == 'H' or typ == 'U': rhs[iT] += V0/(R*T) - V0/R
+		if fixP:
+			M[iN,iT] = np.dot(n[gas],E[gas])
+			M[iT,iN] = np.dot(n[gas],W[gas])
+			if typ == 'S': rhs[iT] += ntot - np.sum(n[gas])
+	try:
+		x = np.linalg.solve(M,rhs)
+	except np.linalg.LinAlgError:
+		x = np.linalg.lstsq(M,rhs,rcond=None)[0]
+	dlnn = x[iN] if fixP else 0.
+	dlnT = x[iT] if typ != 'T' else 0.
+	dlnnj = np.zeros_like(n)
+	dlnnj[gas] = np.dot(A[:,gas].T,x[:ne]) - mu[gas] + dlnn + E[gas]*dlnT
+	return dlnnj, x[ne:iN], dlnn, dlnT, np.dot(A.T,x[:ne]) - mu
+
+
+def newton_setup(ids, n0, hgs_data):
+	'''
+	Species made of the elements present, element by species matrix,
+	atoms of each element, gases, temperature limits and NASA
+	polynomials (function of the temperature) for the Newton iterations
+	'''
+	_, A = hgs_data.elements(ids)
+	b0   = np.dot(A,n0)
+	act  = ~np.any(A[b0 == 0,:] != 0,axis=0)
+	A, b0 = A[b0 != 0,:][:,act], b0[b0 != 0]
+	keep  = independent_rows(A)
+	A, b0 = A[keep,:], b0[keep]
+	lim, lv, hv = hgs_data.coefs_block(ids[act])
+	coefs = lambda T: np.where((T <= lim[:,1])[:,None],lv,hv)
+	return act, A, b0, hgs_data.gas_array(ids[act]), lim, coefs
+
+
+def newton_damping(x, dlnnj, dlnn, dlnT):
+	'''
+	Damping of a Newton step (RP-1311 eqs. 3.1-3.3), x = ln(n_j/n)
+	'''
+	big   = (x > -18.420681) & (dlnnj > 0)
+	lam1  = 2./max(5.*abs(dlnT),5.*abs(dlnn),np.max(np.abs(dlnnj[big]),initial=0.),1e-300)
+	small = (x <= -18.420681) & (dlnnj >= 0)
+	lam2  = np.min(np.abs((-x[small] - 9.2103404)/(dlnnj[small] - dlnn + 1e-300)),initial=np.inf)
+	return min(1.,lam1,lam2)
+
+
+def newton_eq(ids, n0, typ, V0, P, vol, T, options, hgs_data, n_init=None):
+	'''
+	Newton iterations for HP, SP, TV and UV equilibrium. The condensed
+	species enter or leave the mixture with the phase test of RP-1311
+	(section 3.5): at convergence, the excluded species, within their
+	temperature range, with the lowest mu/RT - sum(a_ij*pi_i) < 0 is
+	included, and the ones that get negative mols are removed. The
+	iterations start from n_init (warm start) if given.
+	Returns the temperature, the mols and a flag (1 converged, -1 maximum
+	iterations).
+	'''
+	ids  = np.asarray(ids)
+	n0   = np.asarray(n0,np.double)
+	fixP = typ in ['H','S']
+	act, A, b0, gas, lim, coefs = newton_setup(ids,n0,hgs_data)
+	if not np.any(gas): raiseError('Ups,.. there must be gas species on the equilibrium')
+	Tmin, Tmax = np.max(lim[gas,0]), np.min(lim[gas,2])
+	inrange = lambda T: ~gas & (lim[:,0] <= T) & (T <= lim[:,2])
+	# Initial estimate, the same mols of all the gases and, for the
+	# elements that are not on any gas, a condensed species
+	ntot = np.sum(n0)
+	n    = np.where(gas,ntot/np.sum(gas),0.)
+	lnT  = np.log(np.clip(T,Tmin,Tmax))
+	cnd  = np.zeros(gas.shape,bool)
+	if n_init is not None:
+		n_init = np.asarray(n_init,np.double)[act]
+		n      = np.where(gas,np.maximum(n_init,1e-12*ntot),0.)
+		cnd    = ~gas & (n_init > 0) & inrange(np.exp(lnT))
+		n[cnd] = n_init[cnd]
+		ntot   = np.sum(n[gas])
+	for ee in np.where(~np.any(A[:,gas] != 0,axis=1))[0]:
+		has = inrange(np.exp(lnT)) & (A[ee,:] != 0)
+		if not np.any(has & cnd) and np.any(has): cnd[np.argmax(has)] = True
+	tol  = options.get('newton_tol',0.5e-5)
+	flag = -1
+	for _ in range(options.get('newton_maxiter',100)):
+		dlnnj, dnc, dlnn, dlnT, dmu = newton_step(A,b0,n,ntot,np.exp(lnT),P,vol,typ,V0,coefs,gas,cnd)
+		lam  = newton_damping(np.log(n[gas]/ntot),dlnnj[gas],dlnn,dlnT)
+		conv = np.all(n*np.abs(dlnnj) <= tol*np.sum(n)) and np.all(np.abs(dnc) <= tol*np.sum(n)) \
+			and abs(dlnn)*ntot <= tol*np.sum(n) and abs(dlnT) <= 1e-4
+		n[gas] *= np.exp(lam*dlnnj[gas])
+		n[cnd] += lam*dnc
+		ntot    = ntot*np.exp(lam*dlnn) if fixP else np.sum(n[gas])
+		lnT     = np.log(np.clip(np.exp(lnT + lam*dlnT),Tmin,Tmax))
+		# Remove the condensed species with negative mols or out of range
+		out = cnd & ((n <= 0) | ~inrange(np.exp(lnT)))
+		if np.any(out):
+			cnd[out] = False; n[out] = 0.
+			continue
+		if not conv: continue
+		# Phase test of the condensed species
+		test = inrange(np.exp(lnT)) & ~cnd
+		if np.any(test) and np.min(np.where(test,-dmu,np.inf)) < -tol:
+			cnd[np.argmin(np.where(test,-dmu,np.inf))] = True
+			continue
+		flag = 1
+		break
+	nout = np.zeros((len(ids),),np.double)
+	nout[act] = n
+	# exp(log(T)) may round out of the limits
+	return np.clip(np.exp(lnT),Tmin,Tmax), nout, flag
+
+
+def hgs_eq_hs_ids(ids, n0, typ, V0, P, Tstar, options, hgs_data, n_init=None):
+	'''
+	Equilibrium at fixed pressure and enthalpy (typ='H', V0 [kJ]) or
+	entropy (typ='S', V0 [kJ/K]) solving the temperature together with
+	the composition, starting from Tstar and n_init (if given).
+	Returns the temperature, the mols and a flag (1 converged, -1 maximum
+	iterations).
+	'''
+	return newton_eq(ids,n0,typ,V0,P,None,Tstar,options,hgs_data,n_init)
+
+
+def hgs_eq_uv_ids(ids, n0, typ, V0, vol, T, options, hgs_data):
+	'''
+	Equilibrium at fixed volume (vol [m^3]) and temperature (typ='T') or
+	internal energy (typ='U', V0 [kJ], T is the initial estimate).
+	Returns the temperature, the pressure [bar], the mols and a flag
+	(1 converged, -1 maximum iterations).
+	'''
+	T, n, flag = newton_eq(ids,n0,typ,V0,None,vol,T,options,hgs_data)
+	return T, np.sum(n[hgs_data.gas_array(ids)])*R*T/(1e2*vol), n, flag
+
 
 @cr('HGS.eq')
-def hgs_eq(species, n0, T, P, options=options, hgs_data=HGSData.load()):
+@disk_cached('HGS.eq')
+def hgs_eq(species, n0, T, P, options=options, constraint='TP', V0=None, Tstar=3000, vol=None, sensitivity=False,
+	hgs_data=HGSData.load()):
 	"""
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
 	species, n, Gmin = hgs_eq(species, n0, T, P, **kwargs)
+	species, n, Gmin, state = hgs_eq(species, n0, T, P, sensitivity=True, **kwargs)
+	species, n, Gmin, state = hgs_eq(species, n0, T, P, constraint='HP', **kwargs)
+	species, n, Fmin, state = hgs_eq(species, n0, T, P, constraint='UV', **kwargs)
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
 	hgs_eq calculates the species mols equilibrium at a certain temperature
-	and pressure
+	and pressure, or at a certain pressure and enthalpy (HP) or entropy (SP)
+	solving the temperature with the composition, or at a certain volume and
+	temperature (TV) or internal energy (UV) solving the pressure (and the
+	temperature) with the composition
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Inputs:
 	-----------------------------------------------------------------------------
-	species --> String or numbers of species
+	species --> String or numbers of species, condensed species (unit
+			   activity) are included or excluded from the mixture
 	n0 --> [mol] Initial mixture
 	T --> [K] Temperature. Could be a single value or an array.
-	P --> [bar] Pressure
+		  For HP, SP and UV, temperature of the initial mixture.
+	P --> [bar] Pressure. For TV and UV, pressure of the initial mixture.
 	**kwargs --> opti_eq= Options for the minimize Scipy function
+				 constraint= 'TP' (default), 'HP', 'SP', 'TV' or 'UV'
+				 V0= [kJ] or [kJ/K] Enthalpy (HP), entropy (SP) or internal
+					 energy (UV) of the mixture, the one of n0 at T and P if None
+				 Tstar= [K] Initial estimate of the temperature (HP, SP and UV)
+				 vol= [m^3] Volume (TV and UV), the one of n0 at T and P if None
+				 sensitivity= Return the derivatives of n (only TP)
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Outputs:
@@ -118,6 +504,14 @@ def hgs_eq(species, n0, T, P, options=options, hgs_data=HGSData.load()):
 	species --> Species
 	n --> [mol] Final mixture
 	Gmin --> [kJ] Minimum Gibbs free energy
+	Fmin --> [kJ] Minimum Helmholtz free energy (only TV and UV)
+	state --> Dictionary with the equilibrium state (all the constraints
+			  but TP without sensitivity):
+			  'T' [K] Equilibrium temperature
+			  'P' [bar] Equilibrium pressure
+			  'dn' Dictionary with the derivatives of n from the converged
+			  state 'T' [mol/K], 'P' [mol/bar] and 'n0' (N,N) [mol/mol]
+			  (only TP with sensitivity)
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	* Python HGS 1.0 from Matlab HGS 2.0
@@ -133,5 +527,32 @@ def hgs_eq(species, n0, T, P, options=options, hgs_data=HGSData.load()):
 	# Rebuild mixtures
 	if np.max(ids) >= len(hgs_data):
 		species, n0, _ = hgs_data.rebuild(species,n0,T)
-
-	return species, *hgs_eq_ids(ids, n0, T, P, options, hgs_data)
\ No newline at end of file
+		ids            = hgs_data.id(species)
+		T              = [T[0]]*len(species)
+
+	if constraint == 'TP':
+		n, Gmin = hgs_eq_ids(ids, n0, T, P, options, hgs_data)
+		if not sensitivity: return species, n, Gmin
+		dn = dict(zip(['T','P','n0'],eq_sensitivity(ids,n,T,P,hgs_data)))
+		return species, n, Gmin, {'T':T[0],'P':P,'dn':dn}
+	if constraint not in ['HP','SP','TV','UV']: raiseError(f'Wrong constraint = {constraint}')
+	if sensitivity: raiseError('Ups..., sensitivity is only available for the TP constraint')
+	typ = constraint[0]
+	if constraint[1] == 'V':
+		# Volume and internal energy of the initial mixture (ideal gas,
+		# the condensed species have no PV term)
+		gas = hgs_data.gas_array(ids)
+		ng0 = np.sum(np.asarray(n0,np.double)[gas])
+		if vol is None: vol = ng0*R*T[0]/(1e2*P) # m^3
+		if V0 is None and typ == 'U': V0 = evaluable_prop(ids,n0,T,P,['H'],hgs_data)[0] - ng0*R*T[0]
+		Teq, Peq, n, flag = hgs_eq_uv_ids(ids,n0,typ,V0,vol,Tstar if typ == 'U' else T[0],options,hgs_data)
+		if not flag == 1:
+			raiseWarning("Ups,... Newton iterations have failed in hgs_eq.")
+		Fmin = evaluable_prop(ids,n,Teq,Peq,['g'],hgs_data)[0] - np.sum(n[gas])*R*Teq
+		return species, n, Fmin, {'T':Teq,'P':Peq}
+	if V0 is None: V0 = evaluable_prop(ids,n0,T,P,[typ],hgs_data)[0]
+	Teq, n, flag = hgs_eq_hs_ids(ids,n0,typ,V0,P,Tstar,options,hgs_data)
+	if not flag == 1:
+		raiseWarning("Ups,... Newton iterations have failed in hgs_eq.")
+	Gmin = evaluable_prop(ids,n,Teq,P,['g'],hgs_data)[0]
+	return species, n, Gmin, {'T':Teq,'P':P}
\ No newline at end of file
@@ -10,53 +10,172 @@ ESEIAAT UPC
 '''
 from __future__ import print_function, division
 
+import re, bisect, numpy as np
+
 from .cr          import cr
+from .utils       import raiseError
+
+
+FORMULA_REGEX = re.compile(r'([A-Z][a-z]?)(\d*)')
+
+
+def formula_key(ena,nat):
+    '''
+    Hashable key of a composition, the same for any order of the elements
+    '''
+    return tuple(sorted((e,int(round(n))) for e,n in zip(ena,nat)))
+
+
+def parse_formula(formula):
+    '''
+    Elements and number of atoms of a formula f.e. 'CH3OH' -> ['C','H','O'], [1,4,1]
+    '''
+    comp = {}
+    for e,n in FORMULA_REGEX.findall(formula):
+        comp[e] = comp.get(e,0) + (int(n) if n else 1)
+    return list(comp.keys()), list(comp.values())
+
+
+def build_search(names,ena,nat):
+    '''
+    Search structures over a list of names (species followed by mixtures):
+    the sorted names for prefix queries, the sorted suffixes of the names
+    for substring queries and the species by composition for formula queries
+    '''
+    pref = sorted((n,ii) for ii,n in enumerate(names))
+    suff = sorted((n[jj:],ii) for ii,n in enumerate(names) for jj in range(len(n)))
+    form = {}
+    for ii,(e,n) in enumerate(zip(ena,nat)):
+        form.setdefault(formula_key(e,n),[]).append(ii)
+    return {
+        'prefix'    : ([p[0] for p in pref],[p[1] for p in pref]),
+        'substring' : ([p[0] for p in suff],[p[1] for p in suff]),
+        'formula'   : form,
+    }
+
+
+def search(index,name,mode):
+    '''
+    Sorted ids of the names that match a query
+    '''
+    if mode == 'formula':
+        return list(index['formula'].get(formula_key(*parse_formula(name)),[]))
+    keys, ids = index[mode]
+    lo = bisect.bisect_left(keys,name)
+    hi = bisect.bisect_left(keys,name + '\U0010ffff')
+    return sorted(set(ids[lo:hi]))
 
 
 @cr('HGS.find')
-def hgs_find(name,complete,hgs_data):
+def hgs_find(name,complete,hgs_data,mode='substring',verbose=True):
     '''
     **************************************************************************
     
-     HGSfind(name,complete)
+     ids, names = HGSfind(name,complete,mode,verbose)
     
     **************************************************************************
     
-     HGSfind finds the species and the mixtures that contain the string name.
+     HGSfind finds the species and the mixtures that match the string name.
     
     **************************************************************************
      Inputs:
     --------------------------------------------------------------------------
      name --> String to be found
-     complete --> Prints the complete name if complete = 1
+     complete --> Search on the complete name if complete = 1
+     mode --> 'substring' names that contain the string
+              'prefix' names that start with the string
+              'formula' species with the composition of a formula f.e. 'C2H6O'
+     verbose --> Command Window Print
+    
+     Outputs:
+    --------------------------------------------------------------------------
+     ids --> Ids of the species and mixtures found
+     names --> Names of the species and mixtures found
+    
+    **************************************************************************
+    * Python HGS 1.0 from Matlab HGS 2.1
+    * By Caleb Fuster, Manel Soria and Arnau Miró
+    * ESEIAAT UPC 
+    '''
+    if mode not in ['substring','prefix','formula']:
+        raiseError(f'Wrong mode = {mode}')
+    # Complete names, if the database has them
+    name_base = hgs_data['nameback'] if complete and len(hgs_data['nameback']) > 0 else hgs_data['name']
+
+    # Species are followed by the mixtures
+    ids   = search(hgs_data.search_index(complete),name,mode)
+    names = [name_base[ii] if ii < len(hgs_data) else hgs_data['comb'][ii-len(hgs_data)] for ii in ids]
+
+    if verbose:
+        # Search species
+        cap = True # in case there is no name with the string
+        print('Species that contain %s'%name)
+        for ii,n in zip(ids,names):
+            if ii < len(hgs_data):
+                cap = False
+                print('<%d>  %s'%(ii,n))
+        if cap: # Print None to be a fancy list
+            print('None')
+
+        # Search combinations
+        cap = True
+        print('Mixtures that contain %s'%name)
+        for ii,n in zip(ids,names):
+            if ii >= len(hgs_data):
+                cap = False
+                print('<%d>  %s'%(ii,n))
+        if cap: # Print None to be a fancy list
+            print('None')
+
+    return ids, names
+
+
+@cr('HGS.candidates')
+def hgs_candidates(elements,states,T_range,hgs_data):
+    '''
+    **************************************************************************
+    
+     species = HGScandidates(elements,states,T_range)
+    
+    **************************************************************************
+    
+     HGScandidates finds all the species made only of the given elements,
+     for example to build the products of an equilibrium problem.
+    
+    **************************************************************************
+     Inputs:
+    --------------------------------------------------------------------------
+     elements --> Elements f.e. ['H','O'] ('E' to also get the ions)
+     states --> States of the species f.e. ('G',) for the gases, the first
+                letter of the state is used ('L  1' is 'L'). None for all
+     T_range --> [Tmin, Tmax] where the species have to be valid. None to
+                 not check the temperature limits
     
      Outputs:
     --------------------------------------------------------------------------
-     Command Window Print
+     species --> Names of the species in database order
     
     **************************************************************************
     * Python HGS 1.0 from Matlab HGS 2.1
     * By Caleb Fuster, Manel Soria and Arnau Miró
     * ESEIAAT UPC 
     '''
-    name_base = hgs_data['name'] if not complete else hgs_data['nameback']
-
-    # Search species
-    cap = True # in case there is no name with the string
-    print('Species that contain %s'%name)
-    for ii,n in enumerate(name_base):
-        if name in n:
-            cap = False
-            print('<%d>  %s'%(ii,n))
-    if cap: # Print None to be a fancy list
-        print('None')
-
-    # Search combinations
-    cap = True
-    print('Mixtures that contain %s'%name)
-    for ii,n in enumerate(hgs_data['comb']):
-        if name in n:
-           cap = False
-           print('<%d>  %s'%(len(hgs_data)+ii,n))
-    if cap: # Print None to be a fancy list
-        print('None')
\ No newline at end of file
+    if type(elements) is str: elements = [elements]
+    elem, ena = hgs_data.element_index()
+
+    # Count, for each species, how many of its elements are given
+    ids = [np.fromiter(elem.get(e,()),np.int64) for e in set(elements)]
+    ids = np.concatenate(ids) if len(ids) > 0 else np.zeros((0,),np.int64)
+    cnt = np.bincount(ids,minlength=len(hgs_data))
+    ids = [ii for ii in np.where(cnt > 0)[0] if cnt[ii] == len(ena[ii])]
+
+    out = []
+    for ii in ids:
+        name = hgs_data['name'][ii]
+        if not hgs_data.lookup(name) == ii: continue # Only reachable by name
+        if states is not None and not hgs_data['state'][ii][0] in states: continue
+        if T_range is not None:
+            lim = hgs_data['lim'][ii]
+            if lim[0] > np.min(T_range) or lim[2] < np.max(T_range): continue
+        out.append(name)
+    return out
@@ -0,0 +1,227 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Analytic gradients of the adiabatic flame temperature and the rocket performance
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np, scipy.optimize
+
+from .hgs         import HGSData
+from .cr          import cr
+from .utils       import raiseWarning
+from .definitions import R, g0
+from .hgs_prop    import partial, cp_nasa, h_nasa, s_nasa
+from .hgs_eq      import hgs_eq_hs_ids, eq_sensitivity, options as opt_eq
+
+
+def grad_dict(g, names, N):
+	'''
+	Dictionary of a gradient with respect to the scalar variables
+	(names) followed by the initial mols
+	'''
+	out = dict(zip(names,[g[...,ii] for ii in range(len(names))]))
+	out['n0'] = g[...,len(names):len(names)+N]
+	return out
+
+
+def chamber_state(ids, n0, T0, P, dPx, dT0x, dn0x, Tstar, options, hgs_data):
+	'''
+	Adiabatic equilibrium state of n0 (initial temperature T0) at P and the
+	derivatives of the temperature, the mols and the enthalpy of the initial
+	mixture with respect to the variables x, given dP/dx, dT0/dx and dn0/dx
+	'''
+	N   = len(ids)
+	a0  = hgs_data.coefs_array(ids,T0)
+	h0, cp0 = h_nasa(a0,T0), cp_nasa(a0,T0)
+	H0  = np.dot(n0,h0)
+	dH0 = np.dot(h0,dn0x) + np.dot(n0,cp0)*dT0x
+	T, n, flag = hgs_eq_hs_ids(ids,n0,'H',H0,P,Tstar,options,hgs_data)
+	if not flag == 1: raiseWarning('HGS gradient: the chamber equilibrium has not converged')
+	dnT, dnP, dnn0 = eq_sensitivity(ids,n,T,P,hgs_data)
+	a   = hgs_data.coefs_array(ids,[T]*N)
+	h, cp = h_nasa(a,T), cp_nasa(a,T)
+	# Composition change at fixed temperature and temperature change
+	# that keeps the enthalpy
+	dnx = np.outer(dnP,dPx) + np.dot(dnn0,dn0x)
+	dTx = (dH0 - np.dot(h,dnx))/(np.dot(h,dnT) + np.dot(n,cp))
+	return T, n, H0, dH0, dTx, dnx + np.outer(dnT,dTx)
+
+
+def expanded_state(ids, nc, Sc, dSc, P, dPx, dn0x, Tstar, options, hgs_data):
+	'''
+	Equilibrium state at P with the entropy Sc of the chamber and the
+	derivatives of its temperature, mols and enthalpy with respect to the
+	variables x, given dSc/dx, dP/dx and dn0/dx
+	'''
+	N   = len(ids)
+	T, n, flag = hgs_eq_hs_ids(ids,nc,'S',Sc,P,Tstar,options,hgs_data)
+	if not flag == 1: raiseWarning('HGS gradient: the expanded equilibrium has not converged')
+	dnT, dnP, dnn0 = eq_sensitivity(ids,n,T,P,hgs_data)
+	a   = hgs_data.coefs_array(ids,[T]*N)
+	h, cp, s = h_nasa(a,T), cp_nasa(a,T), s_nasa(a,T,partial(n,P,ids,hgs_data))
+	ng  = np.sum(n[hgs_data.gas_array(ids)])
+	# Composition change at fixed temperature and temperature change
+	# that keeps the entropy
+	dnx = np.outer(dnP,dPx) + np.dot(dnn0,dn0x)
+	dTx = (dSc - np.dot(s,dnx) + R*ng/P*dPx)/(np.dot(s,dnT) + np.dot(n,cp)/T)
+	dn  = dnx + np.outer(dnT,dTx)
+	return T, n, np.dot(n,h), np.dot(h,dn) + np.dot(n,cp)*dTx, dTx, dn
+
+
+def hgs_Tp_grad_ids(ids, n0, T0, P, Tstar, options, hgs_data):
+	'''
+	Main function for hgs_Tp_grad working with ids instead of species
+	'''
+	N   = len(ids)
+	n0  = np.asarray(n0,np.double)
+	# Variables x = [P, T0, n0]
+	dx  = np.eye(2+N)
+	T, n, _, _, dTx, dnx = chamber_state(ids,n0,T0,P,dx[0],dx[1],dx[2:],Tstar,options,hgs_data)
+	return T, n, {'Tp':grad_dict(dTx,['P','T0'],N),'n':grad_dict(dnx,['P','T0'],N)}
+
+
+def hgs_rocket_ids(ids, n0, T0, Pc, Pe, Tstar, options, hgs_data):
+	'''
+	Main function for hgs_rocket working with ids instead of species
+	'''
+	N   = len(ids)
+	n0  = np.asarray(n0,np.double)
+	gas = hgs_data.gas_array(ids)
+	mm  = hgs_data.mm_array(ids)*1e-3
+	m   = np.dot(n0,mm) # kg
+	# Variables x = [Pc, Pe, T0, n0]
+	dx  = np.eye(3+N)
+	dm  = np.dot(mm,dx[3:])
+	# Chamber
+	Tc, nc, H0, dH0, dTc, dnc = chamber_state(ids,n0,T0,Pc,dx[0],dx[2],dx[3:],Tstar,options,hgs_data)
+	a   = hgs_data.coefs_array(ids,[Tc]*N)
+	sc  = s_nasa(a,Tc,partial(nc,Pc,ids,hgs_data))
+	Sc  = np.dot(nc,sc)
+	dSc = np.dot(sc,dnc) + np.dot(nc,cp_nasa(a,Tc))/Tc*dTc - R*np.sum(nc[gas])/Pc*dx[0]
+	# Exit, isentropic expansion with shifting equilibrium
+	_, _, He, dHe, _, _ = expanded_state(ids,nc,Sc,dSc,Pe,dx[1],dx[3:],Tc,options,hgs_data)
+	dh   = (H0 - He)/m                                  # kJ/kg
+	v    = np.sqrt(2e3*dh)                              # m/s
+	Isp  = v/g0
+	dIsp = 1e3/v*((dH0 - dHe)/m - dh*dm/m)/g0
+	# Throat, maximum mass flux (envelope theorem, the throat pressure
+	# does not change the derivatives)
+	def flux(Pt):
+		T, n, _ = hgs_eq_hs_ids(ids,nc,'S',Sc,Pt,Tc,options,hgs_data)
+		return Pt*1e5*m/(np.sum(n[gas])*R*1e3*T)*np.sqrt(max(2e3*(H0 - np.dot(n,h_nasa(hgs_data.coefs_array(ids,[T]*N),T)))/m,0.))
+	Pt  = scipy.optimize.minimize_scalar(lambda Pt: -flux(Pt),bounds=(0.3*Pc,0.9*Pc),method='bounded',options={'xatol':1e-8*Pc}).x
+	Tt, nt, Ht, dHt, dTt, dnt = expanded_state(ids,nc,Sc,dSc,Pt,np.zeros((3+N,)),dx[3:],Tc,options,hgs_data)
+	ngt  = np.sum(nt[gas])
+	dht  = (H0 - Ht)/m
+	cs   = Pc*1e5/flux(Pt)                              # m/s
+	dlnr = dm/m - np.sum(dnt[gas],axis=0)/ngt - dTt/Tt  # Density
+	dlnv = 0.5*((dH0 - dHt)/m - dht*dm/m)/dht           # Velocity
+	dcs  = cs*(dx[0]/Pc - dlnr - dlnv)
+	names = ['Pc','Pe','T0']
+	return Tc, Isp, cs, {'Tc':grad_dict(dTc,names,N),'Isp':grad_dict(dIsp,names,N),'cstar':grad_dict(dcs,names,N)}
+
+
+@cr('HGS.Tp_grad')
+def hgs_Tp_grad(species, n0, T0, P, Tstar=3000, opt_eq=opt_eq, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	Tp, n, species, grad = hgs_Tp_grad(species, n0, T0, P, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_Tp_grad calculates the adiabatic flame temperature and the products
+	in equilibrium together with their derivatives with respect to the
+	pressure, the initial temperature and the initial mols, obtained from
+	the converged state without any extra equilibrium
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	species --> String or numbers of species
+	n0 --> [mols] Number of mols of each species
+	T0 --> [K] Initial temperature
+	P --> [bar] Mixture pressure
+	**kwargs --> Tstar= [K] Initial estimate of the temperature
+				 opt_eq= Options of the equilibrium
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	Tp --> [K] Final temperature
+	n --> [mol] Final mixture
+	species --> String or numbers of species
+	grad --> Dictionary with the derivatives of 'Tp' and 'n', each one a
+			 dictionary with 'P' [1/bar], 'T0' [1/K] and 'n0' [1/mol]
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	ids = hgs_data.id(species)
+	# Rebuild mixtures
+	if np.max(ids) >= len(hgs_data):
+		species, n0, _ = hgs_data.rebuild(species,n0,[T0]*len(species))
+		ids            = hgs_data.id(species)
+
+	Tp, n, grad = hgs_Tp_grad_ids(ids,n0,T0,P,Tstar,opt_eq,hgs_data)
+	return Tp, n, species, grad
+
+
+@cr('HGS.rocket')
+def hgs_rocket(species, n0, T0, Pc, Pe, Tstar=3000, opt_eq=opt_eq, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	Tc, Isp, cstar, species, grad = hgs_rocket(species, n0, T0, Pc, Pe, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_rocket calculates the chamber temperature, the specific impulse and
+	the characteristic velocity of a rocket (shifting flow) together with
+	their derivatives with respect to the chamber and exit pressures, the
+	initial temperature and the initial mols, obtained from the converged
+	states without any extra equilibrium
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	species --> String or numbers of species
+	n0 --> [mols] Number of mols of each species
+	T0 --> [K] Initial temperature
+	Pc --> [bar] Chamber pressure
+	Pe --> [bar] Exit pressure
+	**kwargs --> Tstar= [K] Initial estimate of the chamber temperature
+				 opt_eq= Options of the equilibrium
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	Tc --> [K] Chamber temperature
+	Isp --> [s] Specific impulse, g0 = 9.807 m/s^2
+	cstar --> [m/s] Characteristic velocity
+	species --> String or numbers of species
+	grad --> Dictionary with the derivatives of 'Tc', 'Isp' and 'cstar', each
+			 one a dictionary with 'Pc' [1/bar], 'Pe' [1/bar], 'T0' [1/K] and
+			 'n0' [1/mol]
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	ids = hgs_data.id(species)
+	# Rebuild mixtures
+	if np.max(ids) >= len(hgs_data):
+		species, n0, _ = hgs_data.rebuild(species,n0,[T0]*len(species))
+		ids            = hgs_data.id(species)
+
+	Tc, Isp, cstar, grad = hgs_rocket_ids(ids,n0,T0,Pc,Pe,Tstar,opt_eq,hgs_data)
+	return Tc, Isp, cstar, species, grad
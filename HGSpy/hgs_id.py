@@ -10,17 +10,15 @@ ESEIAAT UPC
 '''
 from __future__ import print_function, division
 
-import numpy as np
-
 from .cr    import cr, cr_stop
 from .utils import raiseError
 
 
-def find_hgs_id(name, hgs_data, combination, ns, raise_error):
+def find_hgs_id(name, hgs_data, raise_error):
 	"""
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
-	 ids = find_hgs_id(name, hgs_data, combination, ns)
+	 ids = find_hgs_id(name, hgs_data, raise_error)
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 
@@ -31,8 +29,7 @@ def find_hgs_id(name, hgs_data, combination, ns, raise_error):
 	-----------------------------------------------------------------------------
 	 name --> String to find
 	 hgs_data --> Database
-	 combination --> Boolean to determinate if exist mixtures
-	 ns --> Length of the database
+	 raise_error --> Raise an error if the name is not found
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Outputs:
@@ -44,18 +41,13 @@ def find_hgs_id(name, hgs_data, combination, ns, raise_error):
 	 * By Caleb Fuster, Manel Soria and Arnau Miró
 	 * ESEIAAT UPC
 	"""
-	search  = np.array([name == s for s in hgs_data['name']])
-	search1 = np.array([name == s for s in hgs_data['comb']] if combination else [0])
+	ids = hgs_data.lookup(name)
+
+	if ids is None and raise_error:
+		cr_stop('HGS.id',0)
+		raiseError(f'hgs_id: {name} not found in the data base')
 
-	if np.any(search) == 0 and np.any(search1) == 0:
-		if raise_error:
-			cr_stop('HGS.id',0)
-			raiseError(f'hgs_id: {name} not found in the data base')
-		else:
-			return None
-		
-	ns = len(hgs_data['mm'])
-	return np.where(search)[0][0] if np.any(search) else ns + np.where(search1)[0][0]
+	return ids
 
 
 @cr('HGS.id')
@@ -85,13 +77,11 @@ def hgs_id(species,hgs_data,raise_error=True):
 	* By Caleb Fuster, Manel Soria and Arnau Miró
 	* ESEIAAT UPC
 	"""
-	combination = not len(hgs_data['comb']) == 0
-
 	if type(species) is list and all(type(s) is str for s in species):
-		return [find_hgs_id(s,hgs_data,combination,len(hgs_data),raise_error) for s in species]
+		return [find_hgs_id(s,hgs_data,raise_error) for s in species]
 
 	if type(species) is str:
-		return [find_hgs_id(species,hgs_data,combination,len(hgs_data),raise_error)]
+		return [find_hgs_id(species,hgs_data,raise_error)]
 
 	cr_stop('HGS.id',0)
 	raiseError("uhh ? hgs_id wrong data type")
\ No newline at end of file
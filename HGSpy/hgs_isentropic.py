@@ -14,6 +14,7 @@ import numpy as np
 
 from .hgs        import HGSData
 from .cr         import cr
+from .hgs_cache  import disk_cached
 from .utils      import raiseError, raiseWarning
 from .hgs_prop   import hgs_prop_ids
 from .hgs_eq     import hgs_eq_ids, options as opt_eq
@@ -122,6 +123,7 @@ def hgs_isentropic_ids(ids, n0, T0, P0, type, V1, flow, solver, Tstar,
 	return Tp, n, v2, V2, flag
 
 @cr('HGS.isentropic')
+@disk_cached('HGS.isentropic')
 def hgs_isentropic(species, n0, T0, P0, typ, V1, flow='shifting', solver='hgs_secant', Tstar=3000,
 	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
 	"""
@@ -144,7 +146,9 @@ def hgs_isentropic(species, n0, T0, P0, typ, V1, flow='shifting', solver='hgs_se
 				  It can be 'P' or 'M'
 	V1 --> Value for type:'P'   V1=P [bar] output pressure
 						  'M'   V1=M [] output Mach. Has to be >=1
-	**kwargs --> opti_eq= Options for the minimize Scipy function
+	**kwargs --> solver= 'hgs_secant' (default) or 'hgs_eq' to solve the temperature
+				 together with the equilibrium composition (shifting flow)
+				 opti_eq= Options for the minimize Scipy function
 				 opt_sec= Dictionary with the options for the secant method.
 						"xmin": [K] Temperature minimum for the solver;
 						"xmax" [K] Temperature maximum for the solver;
@@ -188,7 +192,8 @@ def hgs_isentropic(species, n0, T0, P0, typ, V1, flow='shifting', solver='hgs_se
 	# Rebuild mixtures
 	if np.max(ids) >= len(hgs_data):
 		species, n0, T0 = hgs_data.rebuild(species,n0,T0)
-	
+		ids             = hgs_data.id(species)
+
 	Tp, n, v2, V2, flag = hgs_isentropic_ids(ids,n0,T0,P0,typ,V1,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
 
 	return Tp, n, species, v2, V2, flag
\ No newline at end of file
@@ -0,0 +1,166 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Merge of additional thermo files into the database
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import os, pickle as pkl
+
+from .cr    import cr, cr_stop
+from .utils import raiseError
+
+
+MERGE_KEYS = ['name','state','lim','ena','nat','lv','hv','mm']
+
+
+def merge_check(records, on_conflict, hgs_data):
+	'''
+	Error message if the records cannot be merged into the database
+	(None if they can) and the database ids of the records
+	'''
+	if on_conflict not in ['error','skip','replace']:
+		return f'Wrong on_conflict = {on_conflict}', None
+	if hgs_data.shared_name is not None:
+		return 'Ups,.. species cannot be merged on a shared database', None
+	names = records['name']
+	if not len(set(names)) == len(names):
+		return 'Ups,.. the file to merge has repeated species', None
+	ids = [hgs_data.lookup(name) for name in names]
+	if any(ii is not None and ii >= len(hgs_data) for ii in ids):
+		return 'Ups,.. a species to merge has the name of a mixture', ids
+	if on_conflict == 'error' and any(ii is not None for ii in ids):
+		return 'Ups,.. species already in the database: ' + ', '.join(n for n,ii in zip(names,ids) if ii is not None), ids
+	return None, ids
+
+
+def merge_records(records, ids, on_conflict, hgs_data):
+	'''
+	Merge records already validated by merge_check
+	'''
+	added, replaced, new = [], [], []
+	for jj,(name,ii) in enumerate(zip(records['name'],ids)):
+		if ii is None:
+			for key in MERGE_KEYS: hgs_data[key].append(records[key][jj])
+			if len(hgs_data['nameback']) > 0: hgs_data['nameback'].append(name)
+			new.append(len(hgs_data)-1)
+			added.append(name)
+		elif on_conflict == 'replace':
+			for key in MERGE_KEYS: hgs_data[key][ii] = records[key][jj]
+			new.append(ii)
+			replaced.append(name)
+
+	# Incremental index update of the new and replaced species
+	hgs_data.update_index(new,mixtures=False)
+
+	return added, replaced
+
+
+def hgs_merge_species(records, on_conflict, hgs_data):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	 added, replaced = hgs_merge_species(records, on_conflict, hgs_data)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	 hgs_merge_species appends or overrides species of the database in place,
+	 only the new or modified species are indexed again
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 Inputs:
+	-----------------------------------------------------------------------------
+	 records --> Dictionary of lists (name, state, lim, ena, nat, lv, hv, mm)
+	 on_conflict --> What to do with a species already in the database
+	                 'error', 'skip' or 'replace'
+	 hgs_data --> Database
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 Outputs:
+	-----------------------------------------------------------------------------
+	 added --> Names of the species appended to the database
+	 replaced --> Names of the species overridden in the database
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 * Python HGS 1.0 from Matlab HGS 2.0
+	 * By Caleb Fuster, Manel Soria and Arnau Miró
+	 * ESEIAAT UPC
+	"""
+	# Check the conflicts before modifying the database
+	error, ids = merge_check(records,on_conflict,hgs_data)
+	if error is not None: raiseError(error)
+
+	return merge_records(records,ids,on_conflict,hgs_data)
+
+
+@cr('HGS.merge_thermo')
+def hgs_merge_thermo(fname, on_conflict, overlay, hgs_data):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	 added, replaced = hgs_merge_thermo(fname, on_conflict, overlay, hgs_data)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	 hgs_merge_thermo parses a CHEMKIN/NASA-7 THERM file and merges its species
+	 into the database. The merged species can also be stored in an overlay
+	 file that is applied on top of the database by HGSData.load(overlay=...)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 Inputs:
+	-----------------------------------------------------------------------------
+	 fname --> THERM file
+	 on_conflict --> What to do with a species already in the database
+	                 'error', 'skip' or 'replace'
+	 overlay --> Overlay file to update (None to not persist the species)
+	 hgs_data --> Database
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 Outputs:
+	-----------------------------------------------------------------------------
+	 added --> Names of the species appended to the database
+	 replaced --> Names of the species overridden in the database
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	 * Python HGS 1.0 from Matlab HGS 2.0
+	 * By Caleb Fuster, Manel Soria and Arnau Miró
+	 * ESEIAAT UPC
+	"""
+	from .data.downloader import parse_therm
+
+	if not os.path.isfile(fname):
+		cr_stop('HGS.merge_thermo',0)
+		raiseError(f'Ups,.. file {fname} not found')
+	records    = parse_therm(fname)
+	error, ids = merge_check(records,on_conflict,hgs_data)
+	if error is not None:
+		cr_stop('HGS.merge_thermo',0)
+		raiseError(error)
+
+	added, replaced = merge_records(records,ids,on_conflict,hgs_data)
+
+	if overlay is not None:
+		# The overlay keeps the last version of every merged species
+		stored = {key:[] for key in MERGE_KEYS}
+		if os.path.isfile(overlay):
+			file   = open(overlay,'rb')
+			stored = pkl.load(file)
+			file.close()
+		merged = set(added + replaced)
+		for jj,name in enumerate(records['name']):
+			if not name in merged: continue
+			if name in stored['name']:
+				ii = stored['name'].index(name)
+				for key in MERGE_KEYS: stored[key][ii] = records[key][jj]
+			else:
+				for key in MERGE_KEYS: stored[key].append(records[key][jj])
+		file = open(overlay,'wb')
+		pkl.dump(stored,file)
+		file.close()
+
+	return added, replaced
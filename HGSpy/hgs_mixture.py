@@ -80,6 +80,7 @@ def hgs_add_mixture(name, species, percent, hgs_data):
 	hgs_data["comb"].append(name)
 	hgs_data["cspec"].append(species)
 	hgs_data["cper"].append(percent)
+	hgs_data.update_index([])
 
 	return hgs_data
 
@@ -116,6 +117,7 @@ def hgs_subt_mixture(name, hgs_data):
 	hgs_data["comb"].pop(delet)
 	hgs_data["cspec"].pop(delet)
 	hgs_data["cper"].pop(delet)
+	hgs_data.update_index([])
 
 	return hgs_data
 
@@ -153,45 +155,29 @@ def hgs_rebuild(species, n, T, hgs_data):
 	if type(T) in (float,int,np.float64,np.float32): T = [T]*len(species)
 	if len(T) == 1: T = [T[0]]*len(species)
 
-	if type(species[0]) is int:
-		nspec = [None]*len(species)
-		for ii in range(len(species)):
-			if species[ii] < len(hgs_data):
-				nspec[ii] = hgs_data["name"][species[ii]]
-			else:
-				nspec[ii] = hgs_data["comb"][species[ii] - len(hgs_data)]
-		species = nspec
-
-	# Find the species of the mixture
-	newspecies = []
-	newn       = []
-	newT       = []
-	idstopop   = []
-	for i,s in enumerate(species):
-		ids = hgs_data.id(s)[0]
-		if ids >= len(hgs_data):
-			ids -= len(hgs_data)
-			idstopop.append(i)
-			newspecies += [spec for spec in hgs_data["cspec"][ids]]
-			newn       += [n[i]*nsp/100 for nsp  in hgs_data["cper"][ids]]
-			newT       += [T[i] for spec in hgs_data["cspec"][ids]]
-
-	# Substitute mixtures by their species
-	species  = [s  for i,s  in enumerate(species) if i not in idstopop]
-	n        = [nn for i,nn in enumerate(n)       if i not in idstopop]
-	T        = [tt for i,tt in enumerate(T)       if i not in idstopop]
-	species += newspecies
-	n       += newn
-	T       += newT
-
-	# Get the unique species
-	Elem = np.unique(species)
+	# Species ids
+	ids = np.asarray(species if type(species[0]) is int else hgs_data.id(species),np.int64)
+
+	# Substitute mixtures by their species, the species of the
+	# mixtures go after the rest of species (which keep their values)
+	mix = np.where(ids >= len(hgs_data))[0]
+	vec = [hgs_data.mixture_vector(ids[ii]-len(hgs_data)) for ii in mix]
+	spc = np.where(ids < len(hgs_data))[0]
+	n   = [n[ii] for ii in spc] + [nn for ii,v in zip(mix,vec) for nn in (n[ii]*v[1]).tolist()]
+	T   = [T[ii] for ii in spc] + [T[ii] for ii,v in zip(mix,vec) for _ in v[0]]
+	ids = np.concatenate([ids[spc]] + [v[0] for v in vec])
+	species = [hgs_data["name"][q] for q in ids]
+
+	# Get the unique species, adding their mols and keeping
+	# the temperature of the last one
+	Elem, inv = np.unique(species,return_inverse=True)
 	if not len(Elem) == len(species):
-		nun = [0]*len(Elem)
-		for ii,s in enumerate(species):
-			for jj,e in enumerate(Elem):
-				if e == s: nun[jj] += n[ii]
-		n       = nun
+		last = np.zeros((len(Elem),),np.int64)
+		np.maximum.at(last,inv,np.arange(len(species)))
+		nun  = np.zeros((len(Elem),),np.double)
+		np.add.at(nun,inv,np.asarray(n,np.double))
+		n       = nun.tolist()
+		T       = [T[q] for q in last]
 		species = Elem.tolist()
 
-	return species, n, T
\ No newline at end of file
+	return species, n, T
@@ -10,19 +10,67 @@ ESEIAAT UPC
 '''
 from __future__ import print_function, division
 
-import numpy as np
+import numpy as np, scipy.optimize, scipy.interpolate
 
 from .hgs            import HGSData
 from .cr             import cr
+from .hgs_cache      import disk_cached
 from .utils          import raiseError, raiseWarning
 from .definitions    import g0
 from .hgs_prop       import hgs_prop_ids
-from .hgs_eq         import options as opt_eq
+from .hgs_eq         import hgs_eq_hs_ids, evaluable_prop, options as opt_eq
 from .hgs_solver     import hgs_solver, options as opt_sec
 from .hgs_isentropic import hgs_isentropic_ids
+from .hgs_temperature import hgs_T_from, options as opt_T
 
 
+def nozzle_iter_ids(ids, n0, T0, P0, P, Pa, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data, n_out=None):
+	'''
+	Generator of the stations of hgs_nozzle working with ids instead of
+	species, a dictionary is yielded for each pressure. The mols of each
+	station are stored on the columns of n_out if given (hgs_nozzle).
+	'''
+	# Total mass
+	mm  = hgs_prop_ids(ids,n0,T0,P0,['Mm'],hgs_data)[0] # g/mol
+	m   = np.sum(n0)*mm*1e-3 # kg/s
+
+	# Run loop
+	for ii,Pi in enumerate(np.atleast_1d(np.asarray(P,np.double))):
+		T,n,_,M,flag = hgs_isentropic_ids(ids,n0,T0,P0,'P',Pi,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+		if not flag == 1: raiseWarning('HGSnozzle failed to converge/1 flag=%d'%flag)
+		if n_out is not None:
+			n_out[:,ii] = n
+			n = n_out[:,ii]
+		Rg,a = hgs_prop_ids(ids,n,[T]*len(ids),Pi,['Rg','a'],hgs_data) # kJ/(kg*K), m/s
+		rho  = Pi*1e5/(Rg*1000*T)       # kg/m^3 Convert bar to Pa g 2 kG
+		v    = M*a                      # m/s
+		A    = m/(v*rho)                # m^2
+		yield {'station':ii,'P':Pi,'T':T,'n':n,'v':v,'M':M,'A':A,
+			'F':m*v + A*(Pi - Pa)*1e5,'Isp':v/g0,'flag':flag} # Convert bar to Pa
+
+def hgs_nozzle_ids(ids, n0, T0, P0, P, Pa, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data):
+	'''
+	Main function for hgs_nozzle working with ids instead of species
+	'''
+	# Preallocate
+	P   = np.array(P,np.double)
+	T   = np.zeros_like(P)
+	n   = np.zeros((len(ids),len(P)))
+	M   = np.zeros_like(P)
+	v   = np.zeros_like(P)
+	A   = np.zeros_like(P)
+	F   = np.zeros_like(P)
+	Isp = np.zeros_like(P)
+
+	# Run loop
+	for ii,st in enumerate(nozzle_iter_ids(ids,n0,T0,P0,P,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data,n)):
+		print('P = %f,  %i /%i'%(P[ii],ii+1,len(P)))
+		T[ii],v[ii],M[ii],A[ii],F[ii],Isp[ii] = [st[k] for k in ['T','v','M','A','F','Isp']]
+
+	return n, T, v, M, A, F, Isp
+
 @cr('HGS.nozzle')
+@disk_cached('HGS.nozzle')
 def hgs_nozzle(species, n0, T0, P0, P, Pa, flow='shifting', solver='hgs_secant', Tstar=3000, 
 	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
 	'''
@@ -72,31 +120,346 @@ def hgs_nozzle(species, n0, T0, P0, P, Pa, flow='shifting', solver='hgs_secant',
 	# Rebuild mixtures
 	if np.max(ids) >= len(hgs_data):
 		species, n0, T0 = hgs_data.rebuild(species,n0,T0)
+		ids             = hgs_data.id(species)
 
-	# Total mass
-	mm  = hgs_prop_ids(ids,n0,T0,P0,['Mm'],hgs_data)[0] # g/mol
-	m   = np.sum(n0)*mm*1e-3 # kg/s
+	n, T, v, M, A, F, Isp = hgs_nozzle_ids(ids,n0,T0,P0,P,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
 
-	# Preallocate
-	P   = np.array(P)
-	T   = np.zeros_like(P)
-	n   = np.zeros((len(species),len(P)))
-	M   = np.zeros_like(P)
-	v   = np.zeros_like(P)
-	A   = np.zeros_like(P)
-	F   = np.zeros_like(P)
-	Isp = np.zeros_like(P)
+	return species, n, T, v, M, A, F, Isp
 
-	# Run loop
+
+def hgs_nozzle_iter(species, n0, T0, P0, P, Pa, flow='shifting', solver='hgs_secant', Tstar=3000, 
+	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
+	'''
+	**************************************************************************
+	
+	 for station in HGSnozzle_iter(species,n0,T0,P0,P,Pa,Fro_Shift):
+	
+	**************************************************************************
+	 
+	 HGSnozzle_iter is the generator version of HGSnozzle, the flow
+	 properties of each pressure are yielded as soon as they are computed
+	 without writing to the console, so that the results can be streamed
+	 or the loop stopped at any station
+	  
+	**************************************************************************
+	 Inputs:
+	--------------------------------------------------------------------------
+	 Same as HGSnozzle
+	
+	 Outputs (yielded for each pressure):
+	--------------------------------------------------------------------------
+	 station --> Dictionary with the keys:
+				 'species' String or code of species
+				 'station' Position of the pressure on P
+				 'P' [bar] Pressure
+				 'T' [K] Temperature
+				 'n' [mols] Species mols
+				 'v' [m/s] Velocity
+				 'M' [] Mach
+				 'A' [m^2] Area
+				 'F' [N] Thrust
+				 'Isp' [s] Specific impulse, g0 = 9.807 m/s^2
+				 'flag' Solver flag, 1 if it has reached the solution
+	
+	**************************************************************************
+	* Python HGS 1.0 from Matlab HGS 2.1
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	'''
+	if type(T0) in (float,int,np.float64,np.float32): T0 = [T0]*len(species)
+	if len(T0) == 1:                                  T0 = [T0[0]]*len(species)
+
+	ids = hgs_data.id(species)
+	# Rebuild mixtures
+	if np.max(ids) >= len(hgs_data):
+		species, n0, T0 = hgs_data.rebuild(species,n0,T0)
+		ids             = hgs_data.id(species)
+
+	for st in nozzle_iter_ids(ids,n0,T0,P0,P,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data):
+		st['species'] = species
+		yield st
+
+
+def nozzle_station(ids, n0, T0, P0, S, h1, m, P, state, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data):
+	'''
+	Isentropic state at P: temperature, mols, velocity [m/s], density
+	[kg/m^3] and flag. The previous state (T, n) is the warm start of
+	the frozen flow and the 'hgs_eq' solver and it is updated.
+	'''
+	if flow.lower() == 'frozen':
+		n = np.asarray(n0,np.double)
+		T = hgs_T_from(ids,n[None,:],S,P,'S',dict(opt_T,T0=state[0]),hgs_data)[0]
+		flag = 1 if np.isfinite(T) else -1
+	elif solver == 'hgs_eq':
+		T, n, flag = hgs_eq_hs_ids(ids,n0,'S',S,P,state[0],opt_eq,hgs_data,n_init=state[1])
+	else:
+		T, n, _, _, flag = hgs_isentropic_ids(ids,n0,T0,P0,'P',P,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+	H, Rg = evaluable_prop(ids,n,T,P,['H','Rg'],hgs_data)
+	state[:] = [T, n]
+	return T, n, np.sqrt(max(2e3*(h1 - H/m),0.)), P*1e5/(Rg*1e3*T), flag
+
+
+def nozzle_flow(ids, n, T, v, P, m, Pa, hgs_data):
+	'''
+	Mach, area [m^2], thrust [N] and specific impulse [s] of the stations
+	of a nozzle (columns of n) from their state and velocity
+	'''
+	M, A = np.zeros_like(P), np.zeros_like(P)
 	for ii in range(len(P)):
-		print('P = %f,  %i /%i'%(P[ii],ii+1,len(P)))
-		T[ii],n[:,ii],_,M[ii],flag = hgs_isentropic_ids(ids,n0,T0,P0,'P',P[ii],flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
-		if not flag == 1: raiseWarning('HGSnozzle failed to converge/1 flag=%d',flag) 
-		Rg,a,Mm = hgs_prop_ids(ids,n[:,ii],[T[ii]]*len(ids),P[ii],['Rg','a','Mm'],hgs_data) # kJ/(kg*K), m/s, g/mol
-		rho     = P[ii]*1e5/(Rg*1000*T[ii])        # kg/m^3 Convert bar to Pa g 2 kG
-		v[ii]   = M[ii]*a                          # m/s
-		A[ii]   = m/(v[ii]*rho)                    # m^2
-		F[ii]   = m*v[ii] + A[ii]*(P[ii] - Pa)*1e5 # Convert bar to Pa
-		Isp[ii] = v[ii]/g0
-
-	return species, n, T, v, M, A, F, Isp
\ No newline at end of file
+		Rg,a = evaluable_prop(ids,n[:,ii],T[ii],P[ii],['Rg','a'],hgs_data) # kJ/(kg*K), m/s
+		rho  = P[ii]*1e5/(Rg*1000*T[ii])                                          # kg/m^3
+		M[ii] = v[ii]/a
+		A[ii] = m/(v[ii]*rho) if v[ii] > 0 else np.inf                            # m^2
+	return M, A, m*v + A*(P - Pa)*1e5, v/g0
+
+
+def nozzle_eps_iter_ids(ids, n0, T0, P0, eps_sub, eps_sup, Pa, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data):
+	'''
+	Generator of the stations of hgs_nozzle_eps working with ids instead of
+	species. The stations are yielded as they are solved marching from the
+	throat, the subsonic ones towards the inlet and then the supersonic ones
+	towards the exit, as a dictionary with its position on eps_sub + eps_sup.
+	'''
+	eps_sub = np.atleast_1d(np.asarray(eps_sub,np.double))
+	eps_sup = np.atleast_1d(np.asarray(eps_sup,np.double))
+	# Inlet properties
+	S, Mm1, H1 = evaluable_prop(ids,n0,T0,P0,['S','Mm','H'],hgs_data)
+	m   = np.sum(n0)*Mm1*1e-3 # kg/s
+	h1  = H1/m
+	state   = [T0[0], np.asarray(n0,np.double)]
+	station = lambda P: nozzle_station(ids,n0,T0,P0,S,h1,m,P,state,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+	def flux(lnP):
+		_, _, v, rho, _ = station(np.exp(lnP))
+		return rho*v
+
+	# Throat, maximum mass flux
+	lnPt = scipy.optimize.minimize_scalar(lambda lnP: -flux(lnP),bounds=(np.log(0.3*P0),np.log(0.95*P0)),
+		method='bounded',options={'xatol':1e-8}).x
+	At   = m/flux(lnPt)
+	Tt, nt = state[0], state[1].copy()
+	f    = lambda lnP, eps: np.log(m/max(flux(lnP),1e-300)/At) - np.log(eps)
+
+	# March from the throat to each area ratio, subsonic towards the inlet
+	# and supersonic towards the exit
+	for eps, off, sub in [(eps_sub,0,True),(eps_sup,len(eps_sub),False)]:
+		state[:] = [Tt, nt.copy()]
+		lnP0 = lnPt
+		for ii in np.argsort(eps):
+			if not eps[ii] == 1.:
+				if sub:
+					lo, hi = lnP0, np.log(P0) - 1e-9
+				else:
+					lo, hi = lnP0 - 1., lnP0
+					while f(lo,eps[ii]) < 0: lo -= 1.
+				lnP0 = scipy.optimize.brentq(f,lo,hi,args=(eps[ii],),xtol=1e-12)
+			P = np.exp(lnP0) if not eps[ii] == 1. else np.exp(lnPt)
+			T, n, v, _, flag = station(P)
+			M, A, F, Isp = nozzle_flow(ids,n[:,None],np.array([T]),np.array([v]),np.array([P]),m,Pa,hgs_data)
+			yield {'station':off+ii,'eps':eps[ii],'P':P,'T':T,'n':n,'v':v,'M':M[0],'A':A[0],'F':F[0],'Isp':Isp[0],'flag':flag}
+
+
+def hgs_nozzle_eps_ids(ids, n0, T0, P0, eps_sub, eps_sup, Pa, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data):
+	'''
+	Main function for hgs_nozzle_eps working with ids instead of species
+	'''
+	eps_sub = np.atleast_1d(np.asarray(eps_sub,np.double))
+	eps_sup = np.atleast_1d(np.asarray(eps_sup,np.double))
+	if np.any(eps_sub < 1) or np.any(eps_sup < 1): raiseError('Ups..., area ratios must be >= 1')
+	N   = len(eps_sub) + len(eps_sup)
+	n   = np.zeros((len(ids),N))
+	P, T, v, M, A, F, Isp = [np.zeros((N,)) for _ in range(7)]
+	for st in nozzle_eps_iter_ids(ids,n0,T0,P0,eps_sub,eps_sup,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data):
+		ii = st['station']
+		P[ii],T[ii],v[ii],M[ii],A[ii],F[ii],Isp[ii] = [st[k] for k in ['P','T','v','M','A','F','Isp']]
+		n[:,ii] = st['n']
+		if not st['flag'] == 1: raiseWarning('HGSnozzle failed to converge/1 flag=%d'%st['flag'])
+
+	return n, T, v, M, A, F, Isp, P
+
+@cr('HGS.nozzle_eps')
+@disk_cached('HGS.nozzle_eps')
+def hgs_nozzle_eps(species, n0, T0, P0, eps_sub, eps_sup, Pa, flow='shifting', solver='hgs_eq', Tstar=3000,
+	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
+	'''
+	**************************************************************************
+	
+	 [species,n,T,v,M,A,F,Isp,P] = HGSnozzle_eps(species,n0,T0,P0,eps_sub,
+									 eps_sup,Pa,Fro_Shift)
+	
+	**************************************************************************
+	 
+	 HGSnozzle_eps evaluates different flow properties as a function of the
+	 area ratio A/A*, during a isentropic expansion beginning with a very low
+	 velocity. The throat (maximum mass flux) is located once and the
+	 stations are reached marching from it with warm started solutions.
+	  
+	**************************************************************************
+	 Inputs:
+	--------------------------------------------------------------------------
+	 species --> String or code of inlet species
+	 n0 --> [mols] Number of mols/s of each inlet species
+	 T0 --> [K] Inlet temperature
+	 P0 --> [bar] Inlet pressure
+	 eps_sub --> [] Subsonic area ratios A/A* (>= 1)
+	 eps_sup --> [] Supersonic area ratios A/A* (>= 1)
+	 Pa --> [bar] Atmospheric pressure
+	 Fro_Shift --> Select between: 'Frozen' for frozen flow
+								   'Shifting' for shifting flow
+	 solver --> 'hgs_eq' (default, warm started) or any solver of hgs_solver
+	
+	 Outputs:
+	--------------------------------------------------------------------------
+	 species --> String or code of species
+	 n --> [mols] Matrix of pecies mols, sorted as: n(species, station)
+	 T --> [K] Exit temperature
+	 M --> [] Exit Mch
+	 A --> [m^2] Exit area
+	 F --> [N] Thrust
+	 Isp --> [s^]Specific impulse, g0 = 9.807 m/s^2
+	 P --> [bar] Pressure
+	 The stations are the subsonic ones followed by the supersonic ones.
+	
+	**************************************************************************
+	* Python HGS 1.0 from Matlab HGS 2.1
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	'''
+	if type(T0) in (float,int,np.float64,np.float32): T0 = [T0]*len(species)
+	if len(T0) == 1:                                  T0 = [T0[0]]*len(species)
+
+	ids = hgs_data.id(species)
+	# Rebuild mixtures
+	if np.max(ids) >= len(hgs_data):
+		species, n0, T0 = hgs_data.rebuild(species,n0,T0)
+		ids             = hgs_data.id(species)
+
+	n, T, v, M, A, F, Isp, P = hgs_nozzle_eps_ids(ids,n0,T0,P0,eps_sub,eps_sup,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+
+	return species, n, T, v, M, A, F, Isp, P
+
+
+def hgs_nozzle_adaptive_ids(ids, n0, T0, P0, Pe, Pa, tol, flow, solver, Tstar, opt_eq, opt_sci, opt_sec, hgs_data,
+	nstart=5, maxstations=500, dxmin=1e-6):
+	'''
+	Main function for hgs_nozzle_adaptive working with ids instead of species
+	'''
+	# Inlet properties
+	S, Mm1, H1 = evaluable_prop(ids,n0,T0,P0,['S','Mm','H'],hgs_data)
+	m   = np.sum(n0)*Mm1*1e-3 # kg/s
+	h1  = H1/m
+	state = [T0[0], np.asarray(n0,np.double)]
+	def evaluate(lnP, near):
+		'''
+		State [T, v^2, n] at ln(P) warm started from a near station
+		'''
+		state[:] = [near[0], near[2:]]
+		T, n, v, _, flag = nozzle_station(ids,n0,T0,P0,S,h1,m,np.exp(lnP),state,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+		if not flag == 1: raiseWarning('HGSnozzle failed to converge/1 flag=%d'%flag)
+		return np.concatenate([[T,v**2],n])
+	def error(y, yl, v2):
+		'''
+		Error of the linear interpolation yl at a station y on the
+		temperature, the velocity and the mole fractions
+		'''
+		return max(abs(y[0] - yl[0])/y[0],abs(y[1] - yl[1])/max(v2,1e-300),
+			np.max(np.abs(y[2:]/np.sum(y[2:]) - yl[2:]/np.sum(yl[2:]))))
+
+	# Initial stations, uniform on ln(P)
+	x = list(np.linspace(np.log(P0),np.log(Pe),nstart))
+	y = [np.concatenate([[T0[0],0.],n0])]
+	for xx in x[1:]: y.append(evaluate(xx,y[-1]))
+	# Bisection of the intervals where the interpolation error is over the tolerance
+	ii = 0
+	while ii < len(x)-1:
+		if len(x) >= maxstations:
+			raiseWarning('HGSnozzle_adaptive reached the maximum number of stations')
+			break
+		if abs(x[ii+1] - x[ii]) < dxmin:
+			ii += 1
+			continue
+		xm = 0.5*(x[ii] + x[ii+1])
+		ym = evaluate(xm,y[ii])
+		ok = error(ym,0.5*(y[ii] + y[ii+1]),max(yy[1] for yy in y)) <= tol
+		x.insert(ii+1,xm); y.insert(ii+1,ym)
+		if ok: ii += 2
+
+	# Stations
+	P = np.exp(np.array(x))
+	y = np.array(y).T
+	T, v, n = y[0], np.sqrt(y[1]), y[2:]
+	M, A, F, Isp = nozzle_flow(ids,n,T,v,P,m,Pa,hgs_data)
+
+	# Dense output, monotone cubic interpolation on ln(P)
+	interp = scipy.interpolate.PchipInterpolator(-np.array(x),y,axis=1)
+	def dense(Pi):
+		'''
+		n, T, v, M, A, F, Isp at the pressures Pi [bar]
+		'''
+		Pi = np.atleast_1d(np.asarray(Pi,np.double))
+		yi = interp(-np.log(Pi))
+		Ti, vi, ni = yi[0], np.sqrt(np.maximum(yi[1],0.)), np.maximum(yi[2:],0.)
+		return (ni,Ti,vi) + nozzle_flow(ids,ni,Ti,vi,Pi,m,Pa,hgs_data)
+
+	return n, T, v, M, A, F, Isp, P, dense
+
+@cr('HGS.nozzle_adaptive')
+def hgs_nozzle_adaptive(species, n0, T0, P0, Pe, Pa, tol=1e-3, flow='shifting', solver='hgs_eq', Tstar=3000,
+	opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec, hgs_data=HGSData.load()):
+	'''
+	**************************************************************************
+	
+	 [species,n,T,v,M,A,F,Isp,P,dense] = HGSnozzle_adaptive(species,n0,T0,P0,
+											 Pe,Pa,tol,Fro_Shift)
+	
+	**************************************************************************
+	 
+	 HGSnozzle_adaptive evaluates different flow properties during a
+	 isentropic expansion beginning with a very low velocity from P0 to Pe.
+	 The stations are placed so that the interpolation error of the
+	 temperature, the velocity and the composition is under a tolerance.
+	  
+	**************************************************************************
+	 Inputs:
+	--------------------------------------------------------------------------
+	 species --> String or code of inlet species
+	 n0 --> [mols] Number of mols/s of each inlet species
+	 T0 --> [K] Inlet temperature
+	 P0 --> [bar] Inlet pressure
+	 Pe --> [bar] Exit pressure
+	 Pa --> [bar] Atmospheric pressure
+	 tol --> Tolerance on the interpolation error between stations, relative
+			 for T and v**2 (to the exit) and absolute for the mole fractions
+	 Fro_Shift --> Select between: 'Frozen' for frozen flow
+								   'Shifting' for shifting flow
+	 solver --> 'hgs_eq' (default, warm started) or any solver of hgs_solver
+	
+	 Outputs:
+	--------------------------------------------------------------------------
+	 species --> String or code of species
+	 n --> [mols] Matrix of pecies mols, sorted as: n(species, station)
+	 T --> [K] Exit temperature
+	 M --> [] Exit Mch
+	 A --> [m^2] Exit area
+	 F --> [N] Thrust
+	 Isp --> [s^]Specific impulse, g0 = 9.807 m/s^2
+	 P --> [bar] Pressure of the stations
+	 dense --> Function of the pressure that returns n, T, v, M, A, F, Isp
+			   interpolated between the stations
+	
+	**************************************************************************
+	* Python HGS 1.0 from Matlab HGS 2.1
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	'''
+	if type(T0) in (float,int,np.float64,np.float32): T0 = [T0]*len(species)
+	if len(T0) == 1:                                  T0 = [T0[0]]*len(species)
+
+	ids = hgs_data.id(species)
+	# Rebuild mixtures
+	if np.max(ids) >= len(hgs_data):
+		species, n0, T0 = hgs_data.rebuild(species,n0,T0)
+		ids             = hgs_data.id(species)
+
+	n, T, v, M, A, F, Isp, P, dense = hgs_nozzle_adaptive_ids(ids,n0,T0,P0,Pe,Pa,tol,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,hgs_data)
+
+	return species, n, T, v, M, A, F, Isp, P, dense
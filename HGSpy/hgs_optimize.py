@@ -0,0 +1,154 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Mixture ratio optimization
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np, scipy.optimize
+
+from .hgs         import HGSData
+from .cr          import cr, cr_stop
+from .utils       import raiseError, raiseWarning
+from .definitions import g0
+from .hgs_prop    import partial, h_nasa, s_nasa
+from .hgs_eq      import hgs_eq_hs_ids, options as opt_eq
+
+
+def of_composition(ids, nf, no, of, hgs_data):
+	'''
+	Mols of each species on 1 kg of propellants with a mixture ratio of
+	'''
+	mm = hgs_data.mm_array(ids)*1e-3 # kg/mol
+	return (nf/np.dot(nf,mm) + of*no/np.dot(no,mm))/(1. + of)
+
+
+def rocket_point(ids, n0, h0, Pc, Pe, state, options, hgs_data):
+	'''
+	Chamber (HP) and exit (SP, shifting flow) equilibrium of n0 with the
+	initial enthalpies h0 [kJ/mol], warm started from the previous point
+	stored in state. Returns the specific impulse [s] (optimum expansion),
+	-inf if the chamber or the exit equilibrium has not converged.
+	'''
+	m   = np.dot(n0,hgs_data.mm_array(ids))*1e-3 # kg
+	H0  = np.dot(n0,h0)
+	Tc, nc, flag = hgs_eq_hs_ids(ids,n0,'H',H0,Pc,state['Tc'],options,hgs_data,state['nc'])
+	if not flag == 1: return -np.inf
+	# Only the species present, the rest may be out of their limits
+	pc  = nc > 0
+	Sc  = np.dot(nc[pc],s_nasa(hgs_data.coefs_array(ids[pc],[Tc]*np.sum(pc)),Tc,partial(nc,Pc,ids,hgs_data)[pc]))
+	Te, ne, flag = hgs_eq_hs_ids(ids,nc,'S',Sc,Pe,state['Te'],options,hgs_data,state['ne'])
+	if not flag == 1: return -np.inf
+	pe  = ne > 0
+	He  = np.dot(ne[pe],h_nasa(hgs_data.coefs_array(ids[pe],[Te]*np.sum(pe)),Te))
+	v   = np.sqrt(max(2e3*(H0 - He)/m,0.)) # m/s
+	state.update({'Tc':Tc,'nc':nc,'Te':Te,'ne':ne,'v':v})
+	return v/g0
+
+
+def hgs_optimize_of_ids(ids, nf, no, h0, Pc, Pe, bounds, npoints, xtol, Tstar, options, hgs_data):
+	'''
+	Main function for hgs_optimize_of working with ids instead of species
+	'''
+	state = {'Tc':Tstar,'nc':None,'Te':0.5*Tstar,'ne':None,'nevals':0}
+	def isp(of):
+		'''
+		Specific impulse at a mixture ratio of, -inf if it has failed
+		'''
+		state['nevals'] += 1
+		Isp = rocket_point(ids,of_composition(ids,nf,no,of,hgs_data),h0,Pc,Pe,state,options,hgs_data)
+		# A failed point is not a good warm start
+		if np.isinf(Isp): state.update({'Tc':Tstar,'nc':None,'Te':0.5*Tstar,'ne':None})
+		return Isp
+	# Coarse scan (warm started from the fuel rich side) to bracket the maximum
+	ofs = np.linspace(bounds[0],bounds[1],npoints)
+	Isp = np.array([isp(of) for of in ofs])
+	ii  = int(np.argmax(Isp))
+	if np.all(np.isinf(Isp)):
+		cr_stop('HGS.optimize_of',0)
+		raiseError('HGS optimize_of: the equilibrium has failed on all the mixture ratios')
+	if ii == 0 or ii == npoints-1:
+		raiseWarning('HGS optimize_of: the maximum specific impulse is on the bounds of the mixture ratio')
+	# Bounded Brent search on the bracket, warm started from the best point
+	isp(ofs[ii])
+	res = scipy.optimize.minimize_scalar(lambda of: -isp(of),bounds=(ofs[max(ii-1,0)],ofs[min(ii+1,npoints-1)]),
+		method='bounded',options={'xatol':xtol})
+	of  = res.x if -res.fun >= Isp[ii] else ofs[ii]
+	n0  = of_composition(ids,nf,no,of,hgs_data)
+	Isp = isp(of)
+	state.update({'of':of,'n0':n0,'Isp':Isp})
+	return of, Isp, state
+
+
+@cr('HGS.optimize_of')
+def hgs_optimize_of(species, fuel, oxidizer, Pc, Pe, T0=298.15, bounds=(0.5,20.), npoints=8, xtol=1e-4, Tstar=3000,
+	opt_eq=opt_eq, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	of, Isp, species, state = hgs_optimize_of(species, fuel, oxidizer, Pc, Pe, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_optimize_of finds the oxidizer to fuel mass ratio (O/F) of maximum
+	specific impulse of a rocket with an adiabatic chamber at Pc and an
+	isentropic expansion with shifting equilibrium to Pe (optimum expansion).
+	The maximum is bracketed by a coarse scan and refined with a bounded
+	Brent search, each evaluation is warm started from the previous one.
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	species --> Species of the products (mixtures are not accepted)
+	fuel --> Dictionary of the fuel species and their mols f.e. {'H2':1}
+	oxidizer --> Dictionary of the oxidizer species and their mols f.e. {'O2':1}
+	Pc --> [bar] Chamber pressure
+	Pe --> [bar] Exit pressure
+	**kwargs --> T0= [K] Inlet temperature of the propellants
+				 bounds= Interval of O/F (mass) where the maximum is searched
+				 npoints= Points of the coarse scan
+				 xtol= Tolerance on the O/F
+				 Tstar= [K] Initial estimate of the chamber temperature
+				 opt_eq= Options of the equilibrium (Newton iterations)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	of --> Optimum oxidizer to fuel mass ratio
+	Isp --> [s] Specific impulse at the optimum, g0 = 9.807 m/s^2
+	species --> Species (products, fuel and oxidizer)
+	state --> Dictionary with the state at the optimum:
+			  'n0' [mol] Inlet mols of 1 kg of propellants
+			  'Tc' [K], 'nc' [mol] Chamber temperature and mols
+			  'Te' [K], 'ne' [mol] Exit temperature and mols
+			  'v' [m/s] Exit velocity
+			  'nevals' Number of chamber and exit evaluations
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	if type(species) is str: species = [species]
+	species = list(species) + [s for s in list(fuel) + list(oxidizer) if s not in species]
+	ids = np.asarray(hgs_data.id(species))
+	if np.max(ids) >= len(hgs_data):
+		raiseError('Ups..., mixtures are not accepted on hgs_optimize_of')
+	if not bounds[0] > 0 or not bounds[1] > bounds[0]:
+		raiseError('Ups..., wrong O/F bounds (%s)'%str(bounds))
+	nf  = np.array([fuel.get(s,0.)     for s in species],np.double)
+	no  = np.array([oxidizer.get(s,0.) for s in species],np.double)
+	# Inlet enthalpies of the propellants, the products may be out of
+	# their limits at T0 (f.e. cryogenic propellants)
+	T0  = np.atleast_1d(np.asarray(T0,np.double))*np.ones((len(ids),))
+	use = (nf + no) > 0
+	h0  = np.zeros((len(ids),),np.double)
+	h0[use] = h_nasa(hgs_data.coefs_array(ids[use],T0[use]),T0[use])
+
+	of, Isp, state = hgs_optimize_of_ids(ids,nf,no,h0,Pc,Pe,bounds,npoints,xtol,Tstar,opt_eq,hgs_data)
+	return of, Isp, species, state
@@ -105,15 +105,79 @@ def sound(gamma,rg,T):
 
 def partial(n, P, ids, hgs_data):
 	'''
-	Compute partial pressure of gas mixtures
+	Compute partial pressure of the gases of a mixture, the condensed
+	species have unit activity (the reference pressure is returned)
 	'''
-	# Check that  the mixture only contains gases
-	st = [hgs_data['state'][i] == 'G' for i in ids]
-	if not np.all(st):
-		raiseError('Ups,.. Right now entropy can be calculated only for gas mixtures')
+	n   = np.asarray(n,np.double)
+	gas = hgs_data.gas_array(ids)
+	ng  = np.sum(n[gas])
 	# Compute partial pressure
-	nt = np.sum(n)
-	return [P*nn/nt for nn in n]
+	return np.where(gas,P*n/(ng if ng > 0 else 1.),1.)
+
+def cp_nasa(a,T):
+	'''
+	Cp [kJ/(mol*K)] of a block of NASA polynomials a (N,7) at T (N,)
+	'''
+	return R*(a[:,0] + T*(a[:,1] + T*(a[:,2] + T*(a[:,3] + T*a[:,4]))))
+
+def h_nasa(a,T):
+	'''
+	H [kJ/mol] of a block of NASA polynomials a (N,7) at T (N,)
+	'''
+	return R*(a[:,5] + T*(a[:,0] + T*(a[:,1]/2 + T*(a[:,2]/3 + T*(a[:,3]/4 + T*a[:,4]/5)))))
+
+def s_nasa(a,T,P_i,Pref=1.):
+	'''
+	S [kJ/(mol*K)] of a block of NASA polynomials a (N,7) at T (N,)
+	and partial pressures P_i (N,)
+	'''
+	s   = R*(a[:,6] + a[:,0]*np.log(T) + T*(a[:,1] + T*(a[:,2]/2 + T*(a[:,3]/3 + T*a[:,4]/4))))
+	ok  = P_i != 0
+	s[ok] -= R*np.log(P_i[ok]/Pref)
+	return s
+
+
+def eq_derivatives(ids, n, T, P, hgs_data):
+	'''
+	Derivatives of a mixture in chemical equilibrium from the converged
+	state (Gordon & McBride, NASA RP-1311, section 2.5), the condensed
+	species present are included. Returns (dlnV/dlnT)_P, (dlnV/dlnP)_T,
+	Cp_eq [kJ/K], Cv_eq [kJ/K] and gamma_s
+	'''
+	# Only the species present, the rest may be out of their limits
+	n    = np.asarray(n,np.double)
+	T    = np.asarray(T,np.double)*np.ones((len(ids),))
+	prs  = n > 0
+	ids, n, T = np.asarray(ids)[prs], n[prs], T[prs]
+	gas  = hgs_data.gas_array(ids)
+	cnd  = ~gas
+	_, A = hgs_data.elements(ids)
+	A    = A[np.any(A != 0,axis=1),:] # Elements present
+	a    = hgs_data.coefs_array(ids,T)
+	H    = h_nasa(a,T)/(R*T)  # H/RT
+	Cp   = cp_nasa(a,T)/R     # Cp/R
+	ng   = np.sum(n[gas])
+	# Linear system on the element potentials, the condensed mols
+	# and ln(n) derivatives
+	An   = A[:,gas]*n[gas]
+	ne, nc = A.shape[0], np.sum(cnd)
+	M    = np.zeros((ne+nc+1,ne+nc+1),np.double)
+	M[:ne,:ne]       = np.dot(An,A[:,gas].T)
+	M[:ne,ne:ne+nc]  = A[:,cnd]
+	M[ne:ne+nc,:ne]  = A[:,cnd].T
+	M[:ne,-1]        = np.sum(An,axis=1)
+	M[-1,:ne]        = np.sum(An,axis=1)
+	rhs  = np.array([
+		np.concatenate([-np.dot(An,H[gas]),-H[cnd],[-np.dot(n[gas],H[gas])]]), # Temperature
+		np.concatenate([np.sum(An,axis=1),np.zeros((nc,)),[ng]]),             # Pressure
+	]).T
+	x    = np.linalg.lstsq(M,rhs,rcond=None)[0]
+	dlnVdlnT = 1. + x[-1,0]
+	dlnVdlnP = -1. + x[-1,1]
+	cp = R*(np.dot(n,Cp) + np.dot(np.dot(An,H[gas]),x[:ne,0]) + np.dot(H[cnd],x[ne:ne+nc,0])
+		+ np.dot(n[gas],H[gas])*x[-1,0] + np.dot(n[gas],H[gas]**2))
+	cv = cp + ng*R*dlnVdlnT**2/dlnVdlnP
+	return dlnVdlnT, dlnVdlnP, cp, cv, -cp/cv/dlnVdlnP
 
 
 ## ---------- Function   ---------- #
@@ -121,6 +185,8 @@ def hgs_prop_ids(ids, n, T, P, args, hgs_data):
 	'''
 	Main function for hgs_prop working with ids instead of species
 	'''
+	n   = np.asarray(n,np.double)
+	T   = np.asarray(T,np.double)*np.ones((len(ids),))
 	Tm  = np.dot(T,n)/np.sum(n) # Average temperature
 
 	# args: (str) - Property(need to be calculated before)
@@ -134,49 +200,69 @@ def hgs_prop_ids(ids, n, T, P, args, hgs_data):
 	#    (gamma)  - Gamma(2 - Cp & 3 - Cv)
 	#        (a)  - Sound Velocity(1 - Mm & 2 - Cp & 3 - Cv & 7 - Rg & 8 - Gamma)
 	#     (coef)  - Burcat Coef()
+	# Only for mixtures in chemical equilibrium:
+	# (dlnV_dlnT) - (dlnV/dlnT)_P
+	# (dlnV_dlnP) - (dlnV/dlnP)_T
+	#    (cp_eq)  - Equilibrium Cp
+	#    (cv_eq)  - Equilibrium Cv
+	#   (gammas)  - Isentropic exponent
+	#     (a_eq)  - Equilibrium sound velocity(1 - Mm & gammas)
 	if len(args) == 0:
 		args = ['mm','cp','cv','h','s','g','rg','gamma','a']
 
+	# Species properties are computed only once and on demand
+	cache = {}
+	def get(key):
+		if key not in cache:
+			if key == 'coef': cache[key] = hgs_data.coefs_array(ids,T)
+			if key == 'mm':   cache[key] = np.dot(n,hgs_data.mm_array(ids))/np.sum(n)
+			if key == 'cp_i': cache[key] = cp_nasa(get('coef'),T)
+			if key == 'h_i':  cache[key] = h_nasa(get('coef'),T)
+			if key == 'cp':   cache[key] = np.dot(n,get('cp_i'))
+			if key == 'cv':   cache[key] = np.dot(n,get('cp_i') - R*get('gas')) # Only the gases
+			if key == 'gas':  cache[key] = hgs_data.gas_array(ids)
+			if key == 'rg':
+				cache[key] = rg(get('mm'))
+				if not np.all(get('gas')): cache[key] *= np.sum(n[get('gas')])/np.sum(n) # Only the gases
+			if key == 'h':    cache[key] = np.dot(n,get('h_i'))
+			if key == 's':
+				P_i        = partial(n, P, ids, hgs_data)
+				cache['s_i'] = s_nasa(get('coef'),T,P_i)
+				cache[key] = np.dot(n,cache['s_i'])
+			if key == 'g':
+				get('s')
+				cache[key] = np.dot(n,get('h_i') - T*cache['s_i'])
+			if key in ['dlnv_dlnt','dlnv_dlnp','cp_eq','cv_eq','gammas']:
+				cache.update(zip(['dlnv_dlnt','dlnv_dlnp','cp_eq','cv_eq','gammas'],eq_derivatives(ids,n,T,P,hgs_data)))
+		return cache[key]
+
 	# Generate output
 	out = []
 	for a in args:
 		if a.lower() == 'mm': # Molar mass
-			mm = [hgs_data['mm'][i] for i in ids]
-			nt = np.sum(n)
-			out.append(np.dot(n,mm)/nt)
+			out.append(get('mm'))
 		if a.lower() == 'cp': # Cp
-			cp = [hgs_data.cp(i,Ti) for i,Ti in zip(ids,T)]
-			out.append(np.dot(n,cp))
+			out.append(get('cp'))
 		if a.lower() == 'cv': # Cv
-			cv = [hgs_data.cv(i,Ti) for i,Ti in zip(ids,T)]
-			out.append(np.dot(n,cv))
+			out.append(get('cv'))
 		if a.lower() == 'h': # H
-			h = [hgs_data.h(i,Ti) for i,Ti in zip(ids,T)]
-			out.append(np.dot(n,h))
+			out.append(get('h'))
 		if a.lower() == 's': # S
-			P_i = partial(n, P, ids, hgs_data)
-			s   = [hgs_data.s(i,Ti,p) for i,p,Ti in zip(ids,P_i,T)]
-			out.append(np.dot(n,s))
+			out.append(get('s'))
 		if a.lower() == 'g': # G
-			P_i = partial(n, P, ids, hgs_data)
-			g   = [hgs_data.g(i,Ti,p) for i,p,Ti in zip(ids,P_i,T)]
-			out.append(np.dot(n,g))
+			out.append(get('g'))
 		if a.lower() == 'rg': # Rg
-			mm = [hgs_data['mm'][i] for i in ids]
-			nt = np.sum(n)
-			out.append(rg(np.dot(n,mm)/nt))
+			out.append(get('rg'))
 		if a.lower() == 'gamma': # Gamma
-			cp = [hgs_data.cp(i,Ti) for i,Ti in zip(ids,T)]
-			cv = [hgs_data.cv(i,Ti) for i,Ti in zip(ids,T)]
-			out.append(gamma(np.dot(n,cp),np.dot(n,cv)))
+			out.append(gamma(get('cp'),get('cv')))
 		if a.lower() == 'a': # a (Sound velocity)
-			mm = [hgs_data['mm'][i] for i in ids]
-			nt = np.sum(n)
-			cp = [hgs_data.cp(i,Ti) for i,Ti in zip(ids,T)]
-			cv = [hgs_data.cv(i,Ti) for i,Ti in zip(ids,T)]
-			out.append(sound(gamma(np.dot(n,cp),np.dot(n,cv)),rg(np.dot(n,mm)/nt),Tm))
+			out.append(sound(gamma(get('cp'),get('cv')),get('rg'),Tm))
 		if a.lower() == 'coef': # Burcat coefficients
-			out.append([hgs_data.coef(i,Ti) for i,Ti in zip(ids,T)])
+			out.append(get('coef'))
+		if a.lower() in ['dlnv_dlnt','dlnv_dlnp','cp_eq','cv_eq','gammas']: # Equilibrium derivatives
+			out.append(get(a.lower()))
+		if a.lower() == 'a_eq': # Equilibrium sound velocity
+			out.append(sound(get('gammas'),get('rg'),Tm))
 
 	return out
 
@@ -249,6 +335,9 @@ def hgs_prop(species, n, T, P, *args, hgs_data=HGSData.load()):
 	*args --> Expected return: 'Mm' 'Cp' 'Cv' 'H' 'S' 'G' 'Rg' 'gamma' 'a'
 							   If it is empty, all the properties will be
 							   return
+							   For mixtures in chemical equilibrium also:
+							   'dlnV_dlnT' 'dlnV_dlnP' 'cp_eq' 'cv_eq'
+							   'gammas' 'a_eq'
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	Outputs:
@@ -263,6 +352,11 @@ def hgs_prop(species, n, T, P, *args, hgs_data=HGSData.load()):
 		  Rg [kJ/(kg*K)]
 		  gamma
 		  a [m/s]
+		  dlnV_dlnT, dlnV_dlnP
+		  cp_eq [kJ/K]
+		  cv_eq [kJ/K]
+		  gammas
+		  a_eq [m/s]
 
 	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
 	* Python HGS 1.0 from Matlab HGS 2.0
@@ -0,0 +1,153 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Columnar result containers
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np
+
+from .utils import raiseError
+
+
+class HGSResult(object):
+	'''
+	Results of M points (stations of a nozzle, points of a sweep, ...) stored
+	as contiguous NumPy arrays: one column (M,) for each quantity and a
+	composition block n (M,N) with the mols of the N species.
+
+	Slicing a result (r[10:20], r[::2]) gives a new result that shares the
+	arrays (no copies), a string gives a column or the mols of a species.
+	'''
+	def __init__(self, species, columns, n):
+		n = np.ascontiguousarray(n,np.double)
+		if not n.ndim == 2 or not n.shape[1] == len(species):
+			raiseError('HGSResult: the composition must be (M,%d)'%len(species))
+		self._species = list(species)
+		self._columns = {k:np.ascontiguousarray(v,np.double) for k,v in columns.items()}
+		self._n       = n
+		for k,v in self._columns.items():
+			if not v.shape == (n.shape[0],): raiseError(f'HGSResult: column {k} must be ({n.shape[0]},)')
+
+	@classmethod
+	def view(cls, species, columns, n):
+		'''
+		Result on existing arrays without any check or copy
+		'''
+		out = cls.__new__(cls)
+		out._species, out._columns, out._n = species, columns, n
+		return out
+
+	def __len__(self):
+		return self._n.shape[0]
+
+	def __str__(self):
+		return 'HGS result %d points of %s and %d species' % (len(self),', '.join(self._columns),len(self._species))
+
+	def __getitem__(self, key):
+		'''
+		Column of a quantity or mols of a species (string), or a result
+		with some of the points (int, slice or array of indices)
+		'''
+		if type(key) is str:
+			if key in self._columns: return self._columns[key]
+			if key in self._species: return self._n[:,self._species.index(key)]
+			raiseError(f'HGSResult: {key} is not a column nor a species')
+		if isinstance(key,(int,np.integer)): key = slice(key,key+1 if not key == -1 else None)
+		return HGSResult.view(self._species,{k:v[key] for k,v in self._columns.items()},self._n[key])
+
+	@property
+	def species(self):
+		return self._species
+
+	@property
+	def columns(self):
+		return list(self._columns)
+
+	@property
+	def n(self):
+		'''
+		[mol] (M,N) Mols of each species
+		'''
+		return self._n
+
+	@property
+	def x(self):
+		'''
+		(M,N) Mole fraction of each species
+		'''
+		return self._n/np.sum(self._n,axis=1)[:,None]
+
+	def to_dict(self):
+		'''
+		Dictionary of the columns, the mols as n and the species
+		'''
+		return dict(self._columns,n=self._n,species=self._species)
+
+	def to_npz(self, fname, compressed=False):
+		'''
+		Store the result on a NumPy .npz file
+		'''
+		save = np.savez_compressed if compressed else np.savez
+		save(fname,species=np.array(self._species,dtype=str),n=self._n,
+			**{'c_'+k:v for k,v in self._columns.items()})
+
+	@classmethod
+	def load(cls, fname):
+		'''
+		Result from a NumPy .npz file written by to_npz
+		'''
+		data = np.load(fname)
+		return cls(data['species'].tolist(),{k[2:]:data[k] for k in data.files if k.startswith('c_')},data['n'])
+
+	def to_arrow(self):
+		'''
+		Arrow table (pyarrow is needed) with a column for each quantity and
+		for the mols of each species (n_species)
+		'''
+		try:
+			import pyarrow
+		except ImportError:
+			raiseError('HGSResult: pyarrow is needed to export to Arrow')
+		cols = dict(self._columns)
+		for jj,s in enumerate(self._species): cols['n_'+s] = np.ascontiguousarray(self._n[:,jj])
+		return pyarrow.table(cols)
+
+	@classmethod
+	def from_nozzle(cls, species, n, T, v, M, A, F, Isp, P=None, dense=None):
+		'''
+		Result from the outputs of hgs_nozzle, hgs_nozzle_eps or
+		hgs_nozzle_adaptive (n sorted as n(species, station)), the
+		dense output function of hgs_nozzle_adaptive is ignored
+		'''
+		columns = {'T':T,'v':v,'M':M,'A':A,'F':F,'Isp':Isp}
+		if P is not None: columns['P'] = P
+		return cls(species,columns,np.asarray(n).T)
+
+	@classmethod
+	def from_records(cls, records, species=None, size=64):
+		'''
+		Result from an iterable of dictionaries (hgs_nozzle_iter,
+		hgs_Tp_iter, ...), the scalar numbers are the columns and n the
+		composition. The arrays grow by doubling their size.
+		'''
+		M, cols, n = 0, None, None
+		for rec in records:
+			if cols is None:
+				if species is None: species = rec['species']
+				keys = [k for k,v in rec.items() if np.isscalar(v) and not type(v) is str]
+				cols = {k:np.empty((size,),np.double) for k in keys}
+				n    = np.empty((size,len(species)),np.double)
+			if M == n.shape[0]:
+				cols = {k:np.concatenate([v,np.empty_like(v)]) for k,v in cols.items()}
+				n    = np.concatenate([n,np.empty_like(n)])
+			for k in cols: cols[k][M] = rec[k]
+			n[M] = rec['n']
+			M   += 1
+		if cols is None: raiseError('HGSResult: there are no records')
+		return cls(species,{k:v[:M] for k,v in cols.items()},n[:M])
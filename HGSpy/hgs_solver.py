@@ -16,7 +16,7 @@ from .hgs        import HGSData
 from .cr         import cr, cr_start, cr_stop
 from .utils      import raiseError
 from .hgs_secant import hgs_secant
-from .hgs_eq     import hgs_eq_ids, options as opt_eq
+from .hgs_eq     import hgs_eq_ids, hgs_eq_hs_ids, options as opt_eq
 from .hgs_prop   import hgs_prop_ids
 
 
@@ -83,7 +83,10 @@ def hgs_solver(ids, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=
 	V0 --> Entry that should be for tipo:'H'   V0=H [kJ]
 										 'S'   V0=S [kJ/K]
 	P --> [bar] Mixture pressure
-	**kwargs --> opti_eq= Options for the minimize Scipy function
+	**kwargs --> solver= 'hgs_secant', 'hgs_eq' (shifting flow, Newton iterations
+						 on the temperature and the composition at once) or a
+						 solver of scipy.optimize
+				 opti_eq= Options for the minimize Scipy function
 				 opt_sec= Dictionary with the options for the secant method.
 						"xmin": [K] Temperature minimum for the solver;
 						"xmax" [K] Temperature maximum for the solver;
@@ -124,7 +127,10 @@ def hgs_solver(ids, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=
 	else:
 		hastobezero = hastobezeroH_frozen if typ == 'H' else hastobezeroS_frozen
 
-	if solver == 'hgs_secant':
+	if solver == 'hgs_eq' and flow.lower() == 'shifting':
+		# Temperature solved together with the equilibrium composition
+		Tp, n, flag = hgs_eq_hs_ids(ids,n0,typ,V0,P,Tstar,opt_eq,hgs_data)
+	elif solver in ['hgs_secant','hgs_eq']:
 		Tp, n, flag = hgs_secant(lambda Ti, ni: hastobezero(Ti,P,ni,ids,V0,opt_eq,hgs_data),n0,opt_sec)
 	else:
 		# Use a solver from the scipy.optimize package
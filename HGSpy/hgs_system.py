@@ -0,0 +1,191 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS System, a set of species compiled for repeated calls
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np
+
+from .hgs            import HGSData, select_coefs
+from .utils          import raiseError
+from .hgs_prop       import hgs_prop_ids
+from .hgs_eq         import hgs_eq_ids, options as opt_eq
+from .hgs_solver     import options as opt_sec
+from .hgs_Tp         import hgs_Tp_ids
+from .hgs_isentropic import hgs_isentropic_ids
+from .hgs_nozzle     import hgs_nozzle_ids
+
+
+class System(HGSData):
+	'''
+	A set of species resolved once against the HGS database.
+
+	Mixtures are expanded to their species, and the coefficients,
+	limits, molar masses and element matrix of the species are
+	stored as contiguous arrays. The System is itself a (small)
+	HGS database where the species have the ids 0..N-1, so that
+	the prop, eq, Tp, isentropic and nozzle methods go straight
+	to the main algorithms without any lookup.
+
+	Amounts, and temperatures if given per species, are given with
+	respect to the species used to create the System.
+	'''
+	def __init__(self,species,hgs_data=HGSData.load()):
+		if type(species) is str: species = [species]
+		species = list(species)
+		ids     = hgs_data.id(species)
+		nin     = len(species)
+		# Expand the mixtures to their species
+		names = hgs_data.rebuild(species,[1.]*nin,[0.]*nin)[0] if np.max(ids) >= len(hgs_data) else species
+		gids  = hgs_data.id(names)
+		ns    = len(names)
+		# Expansion matrix from input amounts to species amounts
+		# and input where the temperature of each species comes from
+		self._X    = np.zeros((ns,nin),np.double)
+		self._tsrc = np.zeros((ns,),np.int64)
+		for jj,(s,q) in enumerate(zip(species,ids)):
+			if q < len(hgs_data):
+				comp = [(s,1.)]
+			else:
+				comp = [(c,p/100.) for c,p in zip(hgs_data['cspec'][q-len(hgs_data)],hgs_data['cper'][q-len(hgs_data)])]
+			for c,p in comp:
+				ii = names.index(c)
+				if not np.any(self._X[ii,:]): self._tsrc[ii] = jj
+				self._X[ii,jj] += p
+		self._input = species
+		self._ids   = np.arange(ns)
+		# Small database with the species of the system
+		super(System,self).__init__(data={
+			'name'     : [hgs_data['name'][i]  for i in gids],
+			'nameback' : [],
+			'state'    : [hgs_data['state'][i] for i in gids],
+			'lim'      : [hgs_data['lim'][i]   for i in gids],
+			'ena'      : [hgs_data['ena'][i]   for i in gids],
+			'nat'      : [hgs_data['nat'][i]   for i in gids],
+			'lv'       : [hgs_data['lv'][i]    for i in gids],
+			'hv'       : [hgs_data['hv'][i]    for i in gids],
+			'mm'       : [hgs_data['mm'][i]    for i in gids],
+			'comb'     : [],
+			'cspec'    : [],
+			'cper'     : [],
+		})
+		# Contiguous arrays
+		self._lim   = np.ascontiguousarray(self._data['lim'],np.double).reshape(ns,3)
+		self._lv    = np.ascontiguousarray(self._data['lv'],np.double).reshape(ns,7)
+		self._hv    = np.ascontiguousarray(self._data['hv'],np.double).reshape(ns,7)
+		self._mm    = np.ascontiguousarray(self._data['mm'],np.double)
+		self._gas   = np.array([s == 'G' for s in self._data['state']],bool)
+		self._elems, self._A = hgs_data.elements(gids)
+
+	def __str__(self):
+		return 'HGS System of %d species: %s' % (len(self),', '.join(self._data['name']))
+
+	@property
+	def species(self):
+		'''
+		Species of the system once mixtures are expanded
+		'''
+		return list(self._data['name'])
+
+	# -- Arrays --
+	def coefs_array(self,ids,T):
+		'''
+		NASA polynomials of a block of species, each one at
+		its own temperature, as a (len(ids),7) array
+		'''
+		T = np.asarray(T,np.double)*np.ones((len(ids),))
+		return select_coefs(T,self._lim[ids],self._lv[ids],self._hv[ids],lambda ii: self._data['name'][ids[ii]])
+
+	def coefs_block(self,ids):
+		'''
+		Temperature limits (len(ids),3) and low and high temperature
+		NASA polynomials (len(ids),7) of a block of species
+		'''
+		return self._lim[ids], self._lv[ids], self._hv[ids]
+
+	def mm_array(self,ids):
+		'''
+		Molar masses of a block of species [g/mol]
+		'''
+		return self._mm[ids]
+
+	def gas_array(self,ids):
+		'''
+		Whether each species of a block is a gas
+		'''
+		return self._gas[ids]
+
+	def elements(self,ids):
+		'''
+		Elements present on a block of species (sorted) and the
+		element by species matrix of number of atoms
+		'''
+		if len(ids) == len(self) and np.all(ids == self._ids):
+			return self._elems, self._A
+		return super(System,self).elements(ids)
+
+	# -- Inputs --
+	def expand(self,n):
+		'''
+		Convert the amounts of the input species to the amounts of
+		the species of the system
+		'''
+		if type(n) in (float,int,np.float64,np.float32): n = [n]
+		if not len(n) == self._X.shape[1]:
+			raiseError('Ups..., Species (%d) and mols (%d) lengths are not the same!'%(self._X.shape[1],len(n)))
+		return np.dot(self._X,n)
+
+	def temperature(self,T):
+		'''
+		Temperature of each of the species of the system
+		'''
+		if type(T) in (float,int,np.float64,np.float32): T = [T]
+		if len(T) == 1:                return np.full((len(self),),T[0],np.double)
+		if len(T) == len(self._input): return np.asarray(T,np.double)[self._tsrc]
+		return np.asarray(T,np.double)
+
+	# -- Functions --
+	def prop(self, n, T, P, *args):
+		'''
+		Same as hgs_prop for the species of the system
+		'''
+		return hgs_prop_ids(self._ids,self.expand(n),self.temperature(T),P,args,self)
+
+	def eq(self, n0, T, P, options=opt_eq):
+		'''
+		Same as hgs_eq for the species of the system
+		'''
+		return (self.species, *hgs_eq_ids(self._ids,self.expand(n0),self.temperature(T),P,options,self))
+
+	def Tp(self, n0, typ, V0, P, flow='shifting', solver='hgs_secant', Tstar=3000,
+		opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec):
+		'''
+		Same as hgs_Tp for the species of the system
+		'''
+		if typ not in ['H','T']: raiseError(f'Wrong type = {typ}')
+		V0 = self.temperature(V0) if typ == 'T' else [V0]
+		Tp, n, flag = hgs_Tp_ids(self._ids,self.expand(n0),typ,V0,P,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,self)
+		return Tp, n, self.species, flag
+
+	def isentropic(self, n0, T0, P0, typ, V1, flow='shifting', solver='hgs_secant', Tstar=3000,
+		opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec):
+		'''
+		Same as hgs_isentropic for the species of the system
+		'''
+		if typ not in ['P','M']: raiseError(f'Wrong type = {typ}')
+		Tp, n, v2, V2, flag = hgs_isentropic_ids(self._ids,self.expand(n0),self.temperature(T0),P0,typ,V1,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,self)
+		return Tp, n, self.species, v2, V2, flag
+
+	def nozzle(self, n0, T0, P0, P, Pa, flow='shifting', solver='hgs_secant', Tstar=3000,
+		opt_eq=opt_eq, opt_sci={}, opt_sec=opt_sec):
+		'''
+		Same as hgs_nozzle for the species of the system
+		'''
+		n, T, v, M, A, F, Isp = hgs_nozzle_ids(self._ids,self.expand(n0),self.temperature(T0),P0,P,Pa,flow,solver,Tstar,opt_eq,opt_sci,opt_sec,self)
+		return self.species, n, T, v, M, A, F, Isp
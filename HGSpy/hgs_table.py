@@ -0,0 +1,268 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Tabulated equilibrium properties
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np, pickle as pkl, multiprocessing
+
+from .hgs        import HGSData
+from .cr         import cr
+from .utils      import raiseError, raiseWarning
+from .hgs_eq     import hgs_eq_hs_ids, evaluable_prop, options as opt_eq
+
+
+def table_files(fname):
+	'''
+	Data (memory mapped) and metadata files of a table
+	'''
+	return fname + '.npy', fname + '.meta'
+
+
+def table_composition(fuel, oxidizer, Z, hgs_data):
+	'''
+	Mols of each species on 1 kg of a mixture with a fuel mass fraction Z
+	'''
+	mf = np.dot(fuel,hgs_data.mm_array(range(len(fuel))))*1e-3         # kg
+	mo = np.dot(oxidizer,hgs_data.mm_array(range(len(oxidizer))))*1e-3 # kg
+	return Z*fuel/mf + (1.-Z)*oxidizer/mo
+
+
+def table_line(args):
+	'''
+	Equilibrium states of a line of the table (the enthalpies at a pressure
+	and fuel mass fraction): T, rho, cp, gamma, Mm and the mass fractions
+	of the species. The points are NaN where the solver does not converge,
+	and the whole line if HGS raises an error (raiseError).
+	'''
+	h, P, Z, fuel, oxidizer, Tstar, opt_eq, hgs_data = args
+	out = np.full((len(h),5+len(hgs_data)),np.nan)
+	try:
+		table_run(h,P,Z,fuel,oxidizer,Tstar,opt_eq,hgs_data,out)
+	except SystemExit:
+		out[:] = np.nan
+	return out
+
+
+def table_run(h, P, Z, fuel, oxidizer, Tstar, opt_eq, hgs_data, out):
+	'''
+	Fill the points of a line of the table (see table_line), the HP
+	equilibrium marches on the enthalpy warm started from the previous point
+	'''
+	ids = np.arange(len(hgs_data))
+	mm  = hgs_data.mm_array(ids)
+	n0  = table_composition(fuel,oxidizer,Z,hgs_data)
+	T, n = Tstar, None
+	for ii in range(len(h)):
+		try:
+			T, n, flag = hgs_eq_hs_ids(ids,n0,'H',h[ii],P,T,opt_eq,hgs_data,n) # n0 is 1 kg
+		except (FloatingPointError,np.linalg.LinAlgError):
+			flag = 0
+		if not flag == 1:
+			T, n = Tstar, None
+			continue
+		Rg, cp, gamma, Mm = evaluable_prop(ids,n,T,P,['Rg','cp_eq','gammas','Mm'],hgs_data)
+		m   = np.dot(n,mm)*1e-3      # kg
+		rho = P*1e5/(Rg*1000*T)      # kg/m^3
+		out[ii] = np.concatenate([[T,rho,cp/m,gamma,Mm],n*mm*1e-3/m])
+
+
+def interp_weights(axis, x, order):
+	'''
+	Stencil and Lagrange weights of a (possibly non uniform) axis for
+	linear (order 1) or cubic (order 3) interpolation, (M,order+1) arrays
+	'''
+	na = len(axis)
+	if na == 1:
+		return np.zeros((len(x),1),np.int64), np.ones((len(x),1))
+	order = min(order,na-1)
+	i0    = np.clip(np.searchsorted(axis,x) - 1 - (order-1)//2,0,na-order-1)
+	idx   = i0[:,None] + np.arange(order+1)[None,:]
+	xs    = axis[idx]
+	w     = np.ones(idx.shape)
+	for k in range(order+1):
+		for m in range(order+1):
+			if not m == k: w[:,k] *= (x - xs[:,m])/(xs[:,k] - xs[:,m])
+	return idx, w
+
+
+class EqTable(object):
+	'''
+	Table of equilibrium properties on a structured (h, P, Z) grid, where
+	h [kJ/kg] is the mixture enthalpy, P [bar] the pressure and Z the fuel
+	mass fraction. The data lives on a memory mapped file so that big
+	tables are not loaded in memory.
+
+	Fields: T [K], rho [kg/m^3], cp [kJ/(kg*K)] and gamma (isentropic
+	exponent) at equilibrium, Mm [g/mol] and the mass fraction of each
+	species.
+	'''
+	def __init__(self, fname, mode='r'):
+		fdata, fmeta = table_files(fname)
+		file = open(fmeta,'rb')
+		meta = pkl.load(file)
+		file.close()
+		self._fname   = fname
+		self._axes    = [np.asarray(meta[a],np.double) for a in ['h','P','Z']]
+		self._fields  = meta['fields']
+		self._species = meta['species']
+		self._stamp   = meta['stamp']
+		self._data    = np.load(fdata,mmap_mode=mode)
+
+	def __str__(self):
+		return 'HGS equilibrium table %s (%d x %d x %d) of %s' % (self._fname,*self._data.shape[:3],', '.join(self._fields))
+
+	def __call__(self, h, P, Z, fields=None, method='linear'):
+		'''
+		Interpolate the fields (all if None) at arrays of h, P, Z.
+		Returns an (M,len(fields)) array.
+		'''
+		if method not in ['linear','cubic']: raiseError(f'Wrong method = {method}')
+		order = 1 if method == 'linear' else 3
+		cols  = np.array(self.columns(fields),np.int64)[None,:]
+		x     = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v,np.double)) for v in (h,P,Z)])
+		for xx,axis,name in zip(x,self._axes,['h','P','Z']):
+			if np.any(xx < axis[0]) or np.any(xx > axis[-1]):
+				raiseWarning(f'EqTable: {name} out of the table, extrapolating')
+		st  = [interp_weights(axis,xx.ravel(),order) for axis,xx in zip(self._axes,x)]
+		out = np.zeros((x[0].size,cols.shape[1]),np.double)
+		for a in range(st[0][0].shape[1]):
+			for b in range(st[1][0].shape[1]):
+				w = st[0][1][:,a]*st[1][1][:,b]
+				for c in range(st[2][0].shape[1]):
+					out += (w*st[2][1][:,c])[:,None]*self._data[st[0][0][:,a,None],st[1][0][:,b,None],st[2][0][:,c,None],cols]
+		return out
+
+	@property
+	def fields(self):
+		return self._fields
+
+	@property
+	def species(self):
+		return self._species
+
+	@property
+	def axes(self):
+		'''
+		Grid of the table h [kJ/kg], P [bar], Z
+		'''
+		return self._axes
+
+	@property
+	def stamp(self):
+		'''
+		Version stamp of the database used to build the table
+		'''
+		return self._stamp
+
+	def columns(self, fields=None):
+		'''
+		Position of some fields on the table
+		'''
+		if fields is None: return list(range(len(self._fields)))
+		if type(fields) is str: fields = [fields]
+		for f in fields:
+			if not f in self._fields: raiseError(f'EqTable: field {f} not in the table')
+		return [self._fields.index(f) for f in fields]
+
+	def error_estimate(self, fields=None, npoints=1000, seed=0):
+		'''
+		Estimation of the interpolation error of the fields as the difference
+		between the linear and cubic interpolations at random points of the
+		table. Returns the maximum and root mean square for each field.
+		'''
+		rng = np.random.default_rng(seed)
+		x   = [rng.uniform(axis[0],axis[-1],npoints) for axis in self._axes]
+		err = np.abs(self(*x,fields=fields,method='cubic') - self(*x,fields=fields,method='linear'))
+		names = [self._fields[c] for c in self.columns(fields)]
+		return {
+			'max' : dict(zip(names,np.nanmax(err,axis=0))),
+			'rms' : dict(zip(names,np.sqrt(np.nanmean(err**2,axis=0)))),
+		}
+
+
+@cr('HGS.table')
+def hgs_table(fname, species, fuel, oxidizer, h, P, Z, processes=1,
+	Tstar=3000, opt_eq=opt_eq, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	table = hgs_table(fname, species, fuel, oxidizer, h, P, Z, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_table fills a table of equilibrium properties (shifting flow) on a
+	structured grid of mixture enthalpy, pressure and fuel mass fraction and
+	stores it on a memory mapped file. Each (P, Z) line is solved marching
+	on the enthalpy, warm started from the previous point.
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	fname --> Table file name (fname.npy and fname.meta are written)
+	species --> Species of the products (mixtures are not accepted)
+	fuel --> Dictionary of the fuel species and their mols f.e. {'H2':1}
+	oxidizer --> Dictionary of the oxidizer species and their mols f.e. {'O2':1}
+	h --> [kJ/kg] Mixture enthalpy axis
+	P --> [bar] Pressure axis
+	Z --> Fuel mass fraction axis
+	processes --> Number of processes used to fill the table
+	**kwargs --> Tstar= [K] Initial estimate of the temperature
+				 opt_eq= Options of the equilibrium (Newton iterations)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	table --> EqTable with the results
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	if type(species) is str: species = [species]
+	species = list(species) + [s for s in list(fuel) + list(oxidizer) if s not in species]
+	ids = hgs_data.id(species)
+	if np.max(ids) >= len(hgs_data):
+		raiseError('Ups..., mixtures are not accepted on hgs_table')
+	h, P, Z = [np.sort(np.atleast_1d(np.asarray(v,np.double))) for v in (h,P,Z)]
+
+	# Small database with the species of the table, cheap to send to the workers
+	sub = hgs_data.subset(species)
+	species = sub['name']
+	nf  = np.array([fuel.get(s,0.)     for s in species],np.double)
+	no  = np.array([oxidizer.get(s,0.) for s in species],np.double)
+
+	# Metadata and memory mapped data
+	fields = ['T','rho','cp','gamma','Mm'] + ['Y_'+s for s in species]
+	fdata, fmeta = table_files(fname)
+	file = open(fmeta,'wb')
+	pkl.dump({'h':h,'P':P,'Z':Z,'fields':fields,'species':species,
+		'fuel':fuel,'oxidizer':oxidizer,'stamp':sub.stamp()},file)
+	file.close()
+	data = np.lib.format.open_memmap(fdata,mode='w+',dtype=np.double,shape=(len(h),len(P),len(Z),len(fields)))
+
+	# Fill the table by (P, Z) lines
+	lines = [(ip,iz) for ip in range(len(P)) for iz in range(len(Z))]
+	tasks = [(h,P[ip],Z[iz],nf,no,Tstar,opt_eq,sub) for ip,iz in lines]
+	def store(results):
+		for (ip,iz),values in zip(lines,results):
+			data[:,ip,iz,:] = values
+	if processes > 1:
+		with multiprocessing.Pool(processes) as pool:
+			store(pool.imap(table_line,tasks,chunksize=max(len(tasks)//(4*processes),1)))
+	else:
+		store(map(table_line,tasks))
+	data.flush()
+	del data
+
+	out   = EqTable(fname)
+	nfail = int(np.sum(np.isnan(out._data[...,0])))
+	if nfail > 0: raiseWarning(f'hgs_table: {nfail} points did not converge (NaN)')
+	return out
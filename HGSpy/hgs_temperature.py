@@ -0,0 +1,158 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Batched temperature from enthalpy or entropy (frozen composition)
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import numpy as np
+
+from .cr          import cr
+from .utils       import raiseError, raiseWarning
+from .hgs_prop    import cp_nasa, h_nasa, s_nasa
+
+
+options = {
+	'T0':      1000., # [K] Initial temperature
+	'tol':     1e-6,  # [K] Tolerance on the temperature
+	'maxiter': 50,    # Maximum Newton iterations
+	'chunk':   65536, # States solved at once
+}
+
+
+def batch_props(lim, lv, hv, T, P_i):
+	'''
+	Cp, H and S of each species (columns) on a block of states (rows),
+	the NASA polynomials are selected for each state
+	'''
+	low = T <= lim[:,1]
+	cp  = np.where(low,cp_nasa(lv,T),cp_nasa(hv,T))
+	if P_i is None: return cp, np.where(low,h_nasa(lv,T),h_nasa(hv,T))
+	return cp, np.where(low,s_nasa(lv,T,P_i),s_nasa(hv,T,P_i))
+
+
+def batch_newton(ids, n, V, P, typ, options, hgs_data):
+	'''
+	Vectorized Newton iterations on the temperature of a block of
+	states with fixed composition, dH/dT = Cp and dS/dT = Cp/T
+	'''
+	lim, lv, hv = hgs_data.coefs_block(ids)
+	Tmin, Tmax  = np.max(lim[:,0]), np.min(lim[:,2])
+	# Partial pressures (entropy only), unit activity of the condensed species
+	P_i = None
+	if typ == 'S':
+		gas = hgs_data.gas_array(ids)
+		P_i = np.where(gas,P[:,None]*n/np.sum(n[:,gas],axis=1)[:,None],1.)
+	T   = np.full((n.shape[0],),options['T0'],np.double)
+	act = np.ones((n.shape[0],),bool)
+	for _ in range(options['maxiter']):
+		Ta   = T[act][:,None]
+		cp,f = batch_props(lim,lv,hv,Ta,None if P_i is None else P_i[act])
+		na   = n[act]
+		dT   = (np.sum(na*f,axis=1) - V[act])/(np.sum(na*cp,axis=1)/(Ta[:,0] if typ == 'S' else 1.))
+		T[act] = np.clip(Ta[:,0] - dT,Tmin,Tmax)
+		act[act] = np.abs(dT) > options['tol']
+		if not np.any(act): break
+	T[act] = np.nan
+	return T
+
+
+def hgs_T_from(ids, n, V, P, typ, options, hgs_data):
+	'''
+	Main function for hgs_T_from_h and hgs_T_from_s
+	'''
+	if type(ids) is str or (type(ids) is list and all(type(s) is str for s in ids)):
+		ids = hgs_data.id(ids)
+	ids = np.asarray(ids,np.int64)
+	if np.max(ids) >= len(hgs_data):
+		raiseError('Ups..., mixtures are not accepted, rebuild them first')
+	n   = np.atleast_2d(np.asarray(n,np.double))
+	V   = np.atleast_1d(np.asarray(V,np.double))*np.ones((n.shape[0],))
+	P   = np.atleast_1d(np.asarray(P,np.double))*np.ones((n.shape[0],))
+	if not n.shape[1] == len(ids):
+		raiseError('Ups..., Species (%d) and mols (%d) lengths are not the same!'%(len(ids),n.shape[1]))
+
+	T = np.empty((n.shape[0],),np.double)
+	for i0 in range(0,n.shape[0],options['chunk']):
+		i1 = min(i0+options['chunk'],n.shape[0])
+		T[i0:i1] = batch_newton(ids,n[i0:i1],V[i0:i1],P[i0:i1],typ,options,hgs_data)
+	nfail = np.sum(np.isnan(T))
+	if nfail > 0: raiseWarning(f'hgs_T_from_{typ.lower()}: {nfail} states did not converge (NaN)')
+	return T
+
+
+@cr('HGS.T_from_h')
+def hgs_T_from_h(ids, n, h, P, options, hgs_data):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	T = hgs_T_from_h(ids, n, h, P, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_T_from_h computes the temperature of many states of fixed (frozen)
+	composition from their enthalpy with vectorized Newton iterations
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	ids --> Ids (or names) of the N species
+	n --> [mol] (M,N) Mols of each species for each state
+	h --> [kJ] (M,) Enthalpy of each state
+	P --> [bar] (M,) Pressure of each state (not used)
+	**kwargs --> options= Dictionary with the options of the Newton method
+				 "T0": [K] Initial temperature; "tol": [K] Tolerance;
+				 "maxiter": Maximum iterations; "chunk": States solved at once
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	T --> [K] (M,) Temperature of each state, NaN if it did not converge
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	return hgs_T_from(ids,n,h,P,'H',options,hgs_data)
+
+
+@cr('HGS.T_from_s')
+def hgs_T_from_s(ids, n, s, P, options, hgs_data):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	T = hgs_T_from_s(ids, n, s, P, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_T_from_s computes the temperature of many states of fixed (frozen)
+	composition from their entropy with vectorized Newton iterations
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	ids --> Ids (or names) of the N species
+	n --> [mol] (M,N) Mols of each species for each state
+	s --> [kJ/K] (M,) Entropy of each state
+	P --> [bar] (M,) Pressure of each state
+	**kwargs --> options= Dictionary with the options of the Newton method
+				 "T0": [K] Initial temperature; "tol": [K] Tolerance;
+				 "maxiter": Maximum iterations; "chunk": States solved at once
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	T --> [K] (M,) Temperature of each state, NaN if it did not converge
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	return hgs_T_from(ids,n,s,P,'S',options,hgs_data)
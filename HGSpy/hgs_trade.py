@@ -0,0 +1,272 @@
+'''
+***********************************************************************************************************
+HGS CHEMICAL EQUATION SOLVER
+
+HGS Trade studies on (Pc, O/F, T0, A/A*) grids with checkpoint and resume
+
+By Caleb Fuster, Manel Soria and Arnau Miró
+ESEIAAT UPC
+***********************************************************************************************************
+'''
+from __future__ import print_function, division
+
+import os, numpy as np, pickle as pkl, multiprocessing
+
+from .hgs           import HGSData
+from .cr            import cr
+from .utils         import raiseError, raiseWarning
+from .hgs_prop      import h_nasa
+from .hgs_eq        import hgs_eq_hs_ids, options as opt_eq
+from .hgs_solver    import options as opt_sec
+from .hgs_nozzle    import nozzle_eps_iter_ids
+from .hgs_optimize  import of_composition
+
+
+AXES   = ['Pc','of','T0','eps']
+FIELDS = ['Tc','Te','Pe','Me','ve','Ae','F','Isp','flag']
+
+
+def trade_files(fname):
+	'''
+	Metadata file, done mask and column of each field of a trade study
+	'''
+	return os.path.join(fname,'meta.pkl'), os.path.join(fname,'done.npy'), lambda field: os.path.join(fname,field+'.npy')
+
+
+def trade_lines(shape):
+	'''
+	(Pc, O/F, T0) lines of the grid ordered so that consecutive lines are
+	neighbours (serpentine on O/F and T0) for the warm starts
+	'''
+	lines = []
+	for ip in range(shape[0]):
+		ofs = range(shape[1]) if ip % 2 == 0 else range(shape[1]-1,-1,-1)
+		for kk,io in enumerate(ofs):
+			ts = range(shape[2]) if (ip*shape[1] + kk) % 2 == 0 else range(shape[2]-1,-1,-1)
+			for it in ts: lines.append((ip,io,it))
+	return lines
+
+
+def trade_chunk(args):
+	'''
+	Results of a chunk of (Pc, O/F, T0) lines, the chamber is warm started
+	from the previous line and the nozzle marches along the area ratios.
+	The stations where HGS fails are NaN with flag 0, as well as the ones
+	after an error on the march. An HGS error (raiseError) fails the whole
+	chunk instead of killing the worker.
+	'''
+	lines, Pc, of, T0, eps, Pa, nf, no, flow, Tstar, opt_eq, opt_sec, hgs_data = args
+	out   = np.full((len(lines),len(eps),len(FIELDS)),np.nan)
+	X     = np.full((len(lines),len(eps),len(hgs_data)),np.nan)
+	out[:,:,-1] = 0
+	try:
+		trade_run(lines,Pc,of,T0,eps,Pa,nf,no,flow,Tstar,opt_eq,opt_sec,hgs_data,out,X)
+	except SystemExit:
+		out[:]      = np.nan
+		out[:,:,-1] = 0
+		X[:]        = np.nan
+	return out, X
+
+
+def trade_run(lines, Pc, of, T0, eps, Pa, nf, no, flow, Tstar, opt_eq, opt_sec, hgs_data, out, X):
+	'''
+	Fill the results of a chunk of lines (see trade_chunk)
+	'''
+	ids   = np.arange(len(hgs_data))
+	Tc, nc = Tstar, None
+	for ii,(ip,io,it) in enumerate(lines):
+		# Chamber, the enthalpy of the propellants only
+		n0  = of_composition(ids,nf,no,of[io],hgs_data)
+		use = n0 > 0
+		H0  = np.dot(n0[use],h_nasa(hgs_data.coefs_array(ids[use],[T0[it]]*np.sum(use)),T0[it]))
+		try:
+			Tc, nc, flag = hgs_eq_hs_ids(ids,n0,'H',H0,Pc[ip],Tc,opt_eq,hgs_data,nc)
+		except (FloatingPointError,np.linalg.LinAlgError):
+			flag = 0
+		if not flag == 1:
+			Tc, nc = Tstar, None
+			continue
+		# Nozzle, the stations solved before a failure are kept
+		try:
+			for st in nozzle_eps_iter_ids(ids,nc,[Tc]*len(ids),Pc[ip],[],eps,Pa,flow,'hgs_eq',Tc,opt_eq,{},opt_sec,hgs_data):
+				if not st['flag'] == 1: continue
+				jj = st['station']
+				out[ii,jj] = [Tc,st['T'],st['P'],st['M'],st['v'],st['A'],st['F'],st['Isp'],1]
+				X[ii,jj]   = st['n']/np.sum(st['n'])
+		except (ValueError,FloatingPointError,np.linalg.LinAlgError):
+			pass
+
+
+class TradeStudy(object):
+	'''
+	Results of a trade study on a (Pc, O/F, T0, A/A*) grid, stored as a
+	columnar store: a memory mapped array with the grid shape for each
+	field and a composition block with the exit mole fractions of the
+	species (last axis).
+
+	Fields: Tc [K], Te [K], Pe [bar], Me, ve [m/s], Ae [m^2/(kg/s)],
+	F [N/(kg/s)], Isp [s] and flag (1 converged, 0 failed, NaN not computed).
+	'''
+	def __init__(self, fname, mode='r'):
+		fmeta, fdone, fcol = trade_files(fname)
+		file = open(fmeta,'rb')
+		meta = pkl.load(file)
+		file.close()
+		self._fname   = fname
+		self._meta    = meta
+		self._axes    = [np.asarray(meta[a],np.double) for a in AXES]
+		self._species = meta['species']
+		self._done    = np.load(fdone,mmap_mode=mode)
+		self._cols    = {f:np.load(fcol(f),mmap_mode=mode) for f in FIELDS + ['X']}
+
+	def __str__(self):
+		return 'HGS trade study %s (%s) %d/%d chunks done' % (self._fname,' x '.join(str(len(a)) for a in self._axes),
+			np.sum(self._done),len(self._done))
+
+	def __getitem__(self, field):
+		'''
+		Column of a field with the grid shape (Pc, O/F, T0, A/A*), X is
+		the exit mole fraction of the species (last axis)
+		'''
+		if field not in self._cols: raiseError(f'TradeStudy: field {field} not in the study')
+		return self._cols[field]
+
+	@property
+	def fields(self):
+		return FIELDS + ['X']
+
+	@property
+	def species(self):
+		return self._species
+
+	@property
+	def axes(self):
+		'''
+		Grid of the study Pc [bar], O/F, T0 [K], A/A*
+		'''
+		return dict(zip(AXES,self._axes))
+
+	@property
+	def complete(self):
+		'''
+		True if all the chunks are done
+		'''
+		return bool(np.all(self._done))
+
+	@property
+	def stamp(self):
+		'''
+		Version stamp of the database used to run the study
+		'''
+		return self._meta['stamp']
+
+
+@cr('HGS.trade')
+def hgs_trade(fname, species, fuel, oxidizer, Pc, of, T0, eps, Pa=0., flow='shifting', chunk=16, processes=1,
+	resume=True, Tstar=3000, opt_eq=opt_eq, opt_sec=opt_sec, hgs_data=HGSData.load()):
+	"""
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	study = hgs_trade(fname, species, fuel, oxidizer, Pc, of, T0, eps, **kwargs)
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+
+	hgs_trade runs a rocket trade study on a Pc x O/F x T0 x A/A* grid: an
+	adiabatic chamber and a nozzle expansion evaluated at the area ratios.
+	The grid is split on chunks of (Pc, O/F, T0) lines, ordered so that the
+	solutions are warm started from their neighbours, that are run on a
+	pool of processes. Each finished chunk is written to the columnar
+	store on disk, so that an interrupted study is resumed where it
+	stopped calling hgs_trade again with the same arguments.
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Inputs:
+	-----------------------------------------------------------------------------
+	fname --> Directory of the study (created if it does not exist)
+	species --> Species of the products (mixtures are not accepted)
+	fuel --> Dictionary of the fuel species and their mols f.e. {'H2':1}
+	oxidizer --> Dictionary of the oxidizer species and their mols f.e. {'O2':1}
+	Pc --> [bar] Chamber pressure axis
+	of --> Oxidizer to fuel mass ratio axis
+	T0 --> [K] Inlet temperature axis of the propellants
+	eps --> Area ratio A/A* axis (>= 1)
+	**kwargs --> Pa= [bar] Atmospheric pressure
+				 flow= 'shifting' or 'frozen' flow on the nozzle
+				 chunk= (Pc, O/F, T0) lines on each chunk
+				 processes= Number of processes
+				 resume= Resume a study on fname (True) or start it again (False)
+				 Tstar= [K] Initial estimate of the chamber temperature
+				 opt_eq= Options of the equilibrium (Newton iterations)
+				 opt_sec= Dictionary with the options for the secant method.
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	Outputs:
+	-----------------------------------------------------------------------------
+	study --> TradeStudy with the results
+
+	*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*+*
+	* Python HGS 1.0 from Matlab HGS 2.0
+	* By Caleb Fuster, Manel Soria and Arnau Miró
+	* ESEIAAT UPC
+	"""
+	if type(species) is str: species = [species]
+	species = list(species) + [s for s in list(fuel) + list(oxidizer) if s not in species]
+	if np.max(hgs_data.id(species)) >= len(hgs_data):
+		raiseError('Ups..., mixtures are not accepted on hgs_trade')
+	axes = dict(zip(AXES,[np.sort(np.atleast_1d(np.asarray(v,np.double))) for v in (Pc,of,T0,eps)]))
+	if np.any(axes['eps'] < 1): raiseError('Ups..., area ratios must be >= 1')
+	shape = tuple(len(axes[a]) for a in AXES)
+
+	# Small database with the species of the study, cheap to send to the workers
+	sub = hgs_data.subset(species)
+	species = sub['name']
+	nf  = np.array([fuel.get(s,0.)     for s in species],np.double)
+	no  = np.array([oxidizer.get(s,0.) for s in species],np.double)
+	lines  = trade_lines(shape[:3])
+	chunks = [lines[i0:i0+chunk] for i0 in range(0,len(lines),chunk)]
+
+	# Metadata and columnar store, an existing study is resumed if it
+	# was run with the same arguments
+	fmeta, fdone, fcol = trade_files(fname)
+	meta = dict(axes,species=species,fuel=fuel,oxidizer=oxidizer,Pa=Pa,flow=flow,chunk=chunk,stamp=sub.stamp())
+	if resume and os.path.isfile(fmeta):
+		file = open(fmeta,'rb')
+		old  = pkl.load(file)
+		file.close()
+		same = all(np.array_equal(old[k],meta[k]) if k in AXES else old[k] == meta[k] for k in meta)
+		if not same: raiseError(f'hgs_trade: {fname} holds a different study, use resume=False to overwrite it')
+		done = np.load(fdone,mmap_mode='r+')
+		cols = {f:np.load(fcol(f),mmap_mode='r+') for f in FIELDS + ['X']}
+	else:
+		os.makedirs(fname,exist_ok=True)
+		file = open(fmeta,'wb')
+		pkl.dump(meta,file)
+		file.close()
+		done = np.lib.format.open_memmap(fdone,mode='w+',dtype=bool,shape=(len(chunks),))
+		cols = {f:np.lib.format.open_memmap(fcol(f),mode='w+',dtype=np.double,shape=shape) for f in FIELDS}
+		cols['X'] = np.lib.format.open_memmap(fcol('X'),mode='w+',dtype=np.double,shape=shape+(len(species),))
+		for f in cols: cols[f][:] = np.nan
+		done[:] = False
+
+	# Run the chunks that are not done, each one is checkpointed as it finishes
+	todo  = [ic for ic in range(len(chunks)) if not done[ic]]
+	tasks = [(chunks[ic],axes['Pc'],axes['of'],axes['T0'],axes['eps'],Pa,nf,no,flow,Tstar,opt_eq,opt_sec,sub) for ic in todo]
+	def store(results):
+		for ic,(out,X) in zip(todo,results):
+			idx = tuple(np.array(chunks[ic]).T)
+			for jj,f in enumerate(FIELDS): cols[f][idx] = out[:,:,jj]
+			cols['X'][idx] = X
+			for f in cols: cols[f].flush()
+			done[ic] = True
+			done.flush()
+	if processes > 1:
+		with multiprocessing.Pool(processes) as pool:
+			store(pool.imap(trade_chunk,tasks))
+	else:
+		store(map(trade_chunk,tasks))
+	del done, cols
+
+	out   = TradeStudy(fname)
+	nfail = int(np.sum(out['flag'] == 0))
+	if nfail > 0: raiseWarning(f'hgs_trade: {nfail} points did not converge (NaN)')
+	return out
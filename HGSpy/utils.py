@@ -12,7 +12,12 @@ from __future__ import print_function, division
 
 import sys, numpy as np
 
-OPTS = {'warnings':True,'errors':True}
+OPTS = {'warnings':True,'errors':True,
+	'eq_cache':0,         # Entries of the equilibrium cache (0 to disable it)
+	'eq_cache_digits':10, # Significant digits of T, P and element totals on the cache keys
+	'disk_cache':None,    # Directory of the persistent cache (None to disable it), must be trusted
+	'disk_cache_size':2**28, # Maximum size of the persistent cache [bytes]
+}
 
 
 def set_options(key,value):